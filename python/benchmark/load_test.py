@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+""" Login and check cycles of many simultaneous accounts against the mock portal """
+
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, sys.path[0] + "/..")
+
+# pylint: disable=wrong-import-position
+from benchmark.mock_portal import MockPortal, MockPortalState
+from sph.sph_html import SphHtml
+from sph.sph_session import SphSession
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """ Nearest rank percentile of the values """
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_cycle(url: str, account: int, parse: bool = True) -> tuple[float, float]:
+    """ Login, fetch and parse the Vertretungsplan, logout; login and cycle duration """
+    start = time.perf_counter()
+    session = SphSession(school_id="4711", user=f"user{account}", password="secret",
+                         portal_url=url, login_url=url)
+    session.login()
+    login_duration = time.perf_counter() - start
+    try:
+        page_text = session.get("vertretungsplan.php")
+        if parse and SphHtml(page_text).is_logged_out():
+            raise ValueError(f"Account {account} is not logged in")
+        session.logout()
+    finally:
+        session.session.close()
+    return login_duration, time.perf_counter() - start
+
+
+def main():
+    """ Main method """
+    parser = argparse.ArgumentParser(description="Load test with many simultaneous accounts")
+    parser.add_argument("--url", help="Portal to use instead of an in-process mock portal")
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--cycles", type=int, default=4, help="Cycles per account")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="Mean latency of the in-process mock portal in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--skip-parse", action="store_true",
+                        help="Do not parse the page, measure the network part only")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    portal = None
+    url = args.url
+    if url is None:
+        portal = MockPortal(MockPortalState(latency=args.latency, error_rate=args.error_rate))
+        portal.start()
+        url = portal.url
+
+    logins = []
+    cycles = []
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_cycle, url, account, not args.skip_parse)
+                   for _ in range(args.cycles) for account in range(args.accounts)]
+        for future in futures:
+            try:
+                login_duration, cycle_duration = future.result()
+                logins.append(login_duration)
+                cycles.append(cycle_duration)
+            except Exception as exc:  # pylint: disable=broad-except
+                logging.debug("Cycle failed: %s", str(exc))
+                errors += 1
+    duration = time.perf_counter() - start
+    if portal is not None:
+        portal.stop()
+
+    results = {
+        'cycles': len(cycles),
+        'errors': errors,
+        'seconds': duration,
+        'logins-per-second': len(logins) / duration,
+        'login-p50': percentile(logins, 0.5),
+        'login-p99': percentile(logins, 0.99),
+        'cycle-p50': percentile(cycles, 0.5),
+        'cycle-p99': percentile(cycles, 0.99),
+    }
+    print(f"{len(cycles)} cycles, {errors} errors in {duration:.2f} s")
+    print(f"logins/sec {results['logins-per-second']:8.1f}")
+    print(f"login  p50 {results['login-p50'] * 1000:8.1f} ms  p99 {results['login-p99'] * 1000:8.1f} ms")
+    print(f"cycle  p50 {results['cycle-p50'] * 1000:8.1f} ms  p99 {results['cycle-p99'] * 1000:8.1f} ms")
+
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
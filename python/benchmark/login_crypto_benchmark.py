@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+""" Measure the cost of the crypto operations of a login """
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+sys.path.insert(0, sys.path[0] + "/..")
+
+# pylint: disable=wrong-import-position
+from Cryptodome.PublicKey import RSA
+from sph.crypto import AesCrypto, RsaCrypto
+from sph.sph_session import generate_uuid
+
+
+def generate_uuid_legacy() -> str:
+    """ Former implementation of generate_uuid for comparison """
+    d = time.time_ns()
+    uuid = ""
+    for c in 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx-xxxxxx3xx':
+        r = (d + int(random.random() * 16)) % 16 | 0
+        d = math.floor(d / 16)
+        if c == 'x':
+            uuid = uuid + "{0:x}".format(r)
+        elif c == 'y':
+            uuid = uuid + "{0:x}".format((r & 0x3 | 0x8))
+        else:
+            uuid = uuid + c
+    return uuid
+
+
+def login_crypto(public_key: str, rsa: RsaCrypto) -> None:
+    """ Crypto of one login: session key, RSA encryption and challenge check """
+    aes = AesCrypto()
+    session_key = aes.encrypt(generate_uuid().encode("utf-8"), generate_uuid().encode("utf-8"))
+    if rsa is None:
+        rsa = RsaCrypto(public_key)
+    rsa.encrypt(session_key)
+    challenge = aes.encrypt(session_key, session_key)
+    if aes.decrypt(challenge, session_key) != session_key:
+        raise ValueError("Challenge does not match")
+
+
+def measure(name: str, func, count: int) -> float:
+    """ Run the function count times and print the time per call """
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    duration = (time.perf_counter() - start) / count
+    print(f"{name:32} {duration * 1e6:10.1f} us/call")
+    return duration
+
+
+def main():
+    """ Main method """
+    parser = argparse.ArgumentParser(description="Measure the crypto cost of a login")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    public_key = RSA.generate(2048).publickey().export_key().decode("utf-8")
+    rsa = RsaCrypto(public_key)
+
+    results = {
+        'generate_uuid_legacy': measure("generate_uuid (legacy)", generate_uuid_legacy, args.count),
+        'generate_uuid': measure("generate_uuid", generate_uuid, args.count),
+        'rsa_import': measure("RsaCrypto (import key)", lambda: RsaCrypto(public_key), args.count),
+        'login_uncached': measure("login crypto (fetched key)",
+                                  lambda: login_crypto(public_key, None), args.count),
+        'login_cached': measure("login crypto (cached key)",
+                                lambda: login_crypto(public_key, rsa), args.count),
+    }
+    print(f"{'speedup generate_uuid':32} {results['generate_uuid_legacy'] / results['generate_uuid']:10.2f}x")
+    print(f"{'speedup login crypto':32} {results['login_uncached'] / results['login_cached']:10.2f}x")
+    print(f"{args.accounts} accounts: {results['login_cached'] * args.accounts * 1000:.1f} ms "
+          f"(cached key), {results['login_uncached'] * args.accounts * 1000:.1f} ms (fetched key)")
+
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+""" Local stand-in for the SPH portal implementing the login flow and the Vertretungsplan """
+
+import argparse
+import base64
+import json
+import logging
+import random
+import secrets
+import sys
+import threading
+import time
+import urllib.parse
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+sys.path.insert(0, sys.path[0] + "/..")
+
+# pylint: disable=wrong-import-position
+from Cryptodome.Cipher import PKCS1_v1_5 as Cipher_PKCS1_v1_5
+from Cryptodome.PublicKey import RSA
+from benchmark.page_generator import generate_page
+from sph.crypto import AesCrypto
+
+LOGGED_OUT_PAGE = '<html><body><div class="alert alert-danger">' \
+                  'Sie sind nicht angemeldet.</div></body></html>'
+
+
+class MockPortalState:
+    """ Sessions, keys and behaviour of the mock portal """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0,
+                 session_ttl: float = 3600, days: int = 5, rows: int = 50,
+                 password: Optional[str] = None) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.session_ttl = session_ttl
+        self.password = password
+        self.private_key = RSA.generate(2048)
+        self.public_key = self.private_key.publickey().export_key().decode("utf-8")
+        self.cipher_rsa = Cipher_PKCS1_v1_5.new(self.private_key)
+        self.aes = AesCrypto()
+        self.page = generate_page(days, rows).encode("utf-8")
+        self.lock = threading.Lock()
+        # sid -> {'last-seen', 'session-key', 'logged-in'}
+        self.sessions: dict[str, dict] = {}
+        self.requests = 0
+        self.errors = 0
+
+    def new_session(self) -> str:
+        """ Create a session after a successful login """
+        sid = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[sid] = {'last-seen': time.monotonic(), 'session-key': None,
+                                  'logged-in': False}
+        return sid
+
+    def get_session(self, sid: Optional[str]) -> Optional[dict]:
+        """ The session if still valid, expired sessions are removed """
+        with self.lock:
+            session = self.sessions.get(sid)
+            if session is None:
+                return None
+            now = time.monotonic()
+            if now - session['last-seen'] > self.session_ttl:
+                del self.sessions[sid]
+                return None
+            session['last-seen'] = now
+            return session
+
+    def remove_session(self, sid: Optional[str]) -> None:
+        """ Logout """
+        with self.lock:
+            self.sessions.pop(sid, None)
+
+
+class MockPortalHandler(BaseHTTPRequestHandler):
+    """ Requests to the mock portal """
+    protocol_version = "HTTP/1.1"
+    server_version = "MockSPH/1.0"
+
+    @property
+    def state(self) -> MockPortalState:
+        """ State of the portal shared by all requests """
+        return self.server.state
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=redefined-builtin
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ Public key, Vertretungsplan and logout """
+        if not self.__prepare():
+            return
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        sid = self.__get_sid()
+
+        if url.path == "/ajax.php" and query.get("f") == ["rsaPublicKey"]:
+            self.__send(200, json.dumps({'publickey': self.state.public_key}).encode("utf-8"),
+                        "application/json")
+        elif url.path == "/vertretungsplan.php":
+            session = self.state.get_session(sid)
+            if session is None or not session['logged-in']:
+                self.__send(200, LOGGED_OUT_PAGE.encode("utf-8"))
+            else:
+                self.__send(200, self.state.page)
+        elif url.path == "/index.php" and "logout" in query:
+            self.state.remove_session(sid)
+            self.__send(200, b"<html><body>Abgemeldet</body></html>")
+        else:
+            self.__send(404, b"Not found")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """ Login, RSA handshake and AJAX login """
+        if not self.__prepare():
+            return
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        length = int(self.headers.get("Content-Length", 0))
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+
+        if url.path == "/" and "i" in query:
+            if self.state.password is not None and form.get("password") != [self.state.password]:
+                self.__send(200, b"<html><body>Login fehlgeschlagen</body></html>")
+                return
+            sid = self.state.new_session()
+            self.__send(200, b"<html><body>Angemeldet</body></html>",
+                        cookie=f"sid={sid}; Path=/")
+        elif url.path == "/ajax.php" and query.get("f") == ["rsaHandshake"]:
+            session = self.state.get_session(self.__get_sid())
+            if session is None or "key" not in form:
+                self.__send(403, b"Forbidden")
+                return
+            session_key = self.state.cipher_rsa.decrypt(base64.b64decode(form["key"][0]), None)
+            if session_key is None:
+                self.__send(200, b'{"challenge": ""}', "application/json")
+                return
+            session['session-key'] = session_key
+            challenge = self.state.aes.encrypt(session_key, session_key).decode("utf-8")
+            self.__send(200, json.dumps({'challenge': challenge}).encode("utf-8"),
+                        "application/json")
+        elif url.path == "/ajax_login.php":
+            sid = self.__get_sid()
+            session = self.state.get_session(sid)
+            if session is None or session['session-key'] is None or form.get("name") != [sid]:
+                self.__send(403, b"Forbidden")
+                return
+            session['logged-in'] = True
+            self.__send(200, b"1", "text/plain")
+        else:
+            self.__send(404, b"Not found")
+
+    def __prepare(self) -> bool:
+        """ Simulate latency and errors, False if an error was sent """
+        with self.state.lock:
+            self.state.requests += 1
+        if self.state.latency > 0:
+            time.sleep(random.expovariate(1 / self.state.latency))
+        if self.state.error_rate > 0 and random.random() < self.state.error_rate:
+            with self.state.lock:
+                self.state.errors += 1
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.__send(503, b"Service unavailable")
+            return False
+        return True
+
+    def __get_sid(self) -> Optional[str]:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return cookie["sid"].value if "sid" in cookie else None
+
+    def __send(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8",
+               cookie: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if cookie is not None:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockPortal:
+    """ Mock portal running in a background thread """
+
+    def __init__(self, state: MockPortalState, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.server = ThreadingHTTPServer((host, port), MockPortalHandler)
+        self.server.daemon_threads = True
+        self.server.state = state
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-portal",
+                                       daemon=True)
+
+    @property
+    def url(self) -> str:
+        """ Base URL for the portal and the login """
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        """ Start serving requests """
+        self.thread.start()
+
+    def stop(self) -> None:
+        """ Stop serving requests """
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    """ Main method """
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the SPH portal")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Mean latency of each request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 503")
+    parser.add_argument("--session-ttl", type=float, default=3600,
+                        help="Seconds until an idle session expires")
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("-d", "--debug", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    portal = MockPortal(MockPortalState(args.latency, args.error_rate, args.session_ttl,
+                                        args.days, args.rows), port=args.port)
+    logging.info("Mock portal at %s (use as portal-url and login-url)", portal.url)
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        portal.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
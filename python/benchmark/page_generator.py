@@ -0,0 +1,46 @@
+""" Generate synthetic Vertretungsplan pages """
+
+import random
+from datetime import date, timedelta
+
+CLASSES = ["05a", "05b", "06a", "07c", "08b", "09a", "10d", "E1", "E2", "E3", "Q1", "Q3"]
+FIELDS = ["Mathe", "Deutsch", "Englisch", "Physik", "Chemie", "Biologie", "Sport", "Kunst"]
+NOTES = ["Vertretung", "Entfall", "Raumänderung", "Betreuung", "Verlegung"]
+ALERTS = ["alert alert-info", "alert alert-warning", "alert alert-success"]
+
+
+def generate_page(days: int = 2, rows: int = 20, seed: int = 0, menu_entries: int = 200,
+                  info_rows: int = 3, alerts: int = 0) -> str:
+    """ Generate a page with the given number of days, delegation and info rows per day
+        and alert blocks """
+    rnd = random.Random(seed)
+    first_day = date(2024, 3, 4)
+    parts = [
+        '<!DOCTYPE html><html><head><title>Vertretungsplan</title>',
+        '<script>' + 'var t = 1;' * menu_entries + '</script></head><body>',
+        '<nav><div class="navbar"><ul>' + ''.join(
+            f'<li class="dropdown"><div class="menu"><a href="#{i}">Menü {i}</a></div></li>'
+            for i in range(menu_entries)) + '</ul></div></nav>',
+    ]
+    for i in range(alerts):
+        parts.append(f'<div class="{ALERTS[i % len(ALERTS)]}"><strong>Hinweis {i}:</strong> '
+                     f'Der Vertretungsplan wird {rnd.choice(["täglich", "stündlich"])} aktualisiert.</div>')
+    for day in range(days):
+        day_id = (first_day + timedelta(days=day)).strftime("%d_%m_%Y")
+        parts.append(f'<div class="panel" id="tag{day_id}"><div class="panel-body">')
+        parts.append('<table class="table infos"><tbody>')
+        for _ in range(info_rows):
+            clazz = rnd.choice(CLASSES)
+            parts.append(f'<tr><td>{clazz}{rnd.choice(FIELDS)} fällt aus</td></tr>')
+        parts.append('</tbody></table>')
+        parts.append(f'<table class="table" id="vtable{day_id}"><thead><tr>'
+                     '<th>Stunde</th><th>Klasse</th><th>Vertreter</th><th>Lehrer</th>'
+                     '<th>Fach</th><th>Raum</th><th>Hinweis</th><th>Hinweis2</th></tr></thead><tbody>')
+        for _ in range(rows):
+            parts.append(
+                f'<tr><td>{rnd.randint(1, 10)}</td><td>{rnd.choice(CLASSES)}</td><td>ABC</td><td>XYZ</td>'
+                f'<td>{rnd.choice(FIELDS)}</td><td>{rnd.randint(100, 300)}</td>'
+                f'<td>{rnd.choice(NOTES)}</td><td>{rnd.choice(["", "Aufgaben"])}</td></tr>')
+        parts.append('</tbody></table></div></div>')
+    parts.append('</body></html>')
+    return "\n".join(parts)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+""" Compare the html parser backends on generated pages """
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, sys.path[0] + "/..")
+
+# pylint: disable=wrong-import-position
+from benchmark.page_generator import generate_page
+from delegation_table import DelegationTable
+from information_table import InformationTable
+from matching.subscription_matcher import Subscription, SubscriptionMatcher
+from sph.sph_html import SphHtml
+from sph.sph_parser import SphParser
+
+MATCHER = SubscriptionMatcher({'': [Subscription("E3", ["Mathe", "Deutsch"])]})
+
+
+def extract_events(page_text: str, parser: SphParser, restricted: bool) -> list[tuple]:
+    """ Extract all events of the page like the executor does """
+    result = []
+    sph_html = SphHtml(page_text, parser, restricted)
+    sph_html.is_logged_out()
+    for div in sph_html.get_day_divs():
+        date_str = datetime.strptime(div.get("id").replace("tag", ""), "%d_%m_%Y") \
+            .date().strftime("%d.%m.%Y")
+        info_element = sph_html.get_info_table(div)
+        result.extend(InformationTable(date_str, info_element).search_by_subscriptions(MATCHER))
+        table_element = sph_html.get_delegation_table(div)
+        result.extend(DelegationTable(date_str, table_element).search_by_subscriptions(MATCHER))
+    return result
+
+
+def main():
+    """ Main method """
+    parser = argparse.ArgumentParser(description="Compare the html parser backends")
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--page", action="append", help="Additional page from SPH")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    corpus = [generate_page(args.days, args.rows, seed) for seed in range(args.pages)]
+    for filename in args.page or []:
+        with open(filename, "r", encoding="utf-8") as file:
+            corpus.append(file.read())
+
+    reference = None
+    timings = {}
+    for backend in SphParser.BACKENDS:
+        sph_parser = SphParser(backend)
+        if sph_parser.backend != backend:
+            print(f"{backend:12} not installed")
+            continue
+        for restricted in [False, True]:
+            name = f"{backend}{' (restricted)' if restricted else ''}"
+            start = time.perf_counter()
+            events = [extract_events(page, sph_parser, restricted) for page in corpus]
+            timings[name] = time.perf_counter() - start
+            if reference is None:
+                reference = events
+            elif events != reference:
+                print(f"{name:25} extracted different events!")
+                sys.exit(1)
+            print(f"{name:25} {timings[name] * 1000 / len(corpus):8.2f} ms/page, "
+                  f"{sum(len(e) for e in events)} events")
+
+    baseline = timings[SphParser.DEFAULT_BACKEND]
+    for name, duration in timings.items():
+        print(f"{name:25} speedup {baseline / duration:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+""" Benchmark suite for parsing, matching, hashing and the hash store """
+
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, sys.path[0] + "/..")
+
+# pylint: disable=wrong-import-position
+from benchmark.page_generator import CLASSES, FIELDS, NOTES, generate_page
+from delegation_table import DelegationTable
+from information_table import InformationTable
+from matching.subscription_matcher import Subscription, SubscriptionMatcher
+from push_over.hashes import Hashes
+from push_over.push_over import hash_event
+from sph.sph_html import SphHtml
+from sph.sph_parser import SphParser
+
+CLASS = "E3"
+CLASS_FIELDS = ["Mathe", "Deutsch"]
+MATCHER = SubscriptionMatcher({'': [Subscription(CLASS, CLASS_FIELDS)]})
+
+
+def get_date_str(div) -> str:
+    """ Date of a day container like the executor calculates it """
+    return datetime.strptime(div.get("id").replace("tag", ""), "%d_%m_%Y") \
+        .date().strftime("%d.%m.%Y")
+
+
+def measure(func, min_seconds: float) -> tuple[float, int]:
+    """ Seconds per call and number of calls, running at least min_seconds """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        duration = time.perf_counter() - start
+        if duration >= min_seconds:
+            return duration / calls, calls
+
+
+class BenchmarkSuite:
+    """ Collect the results of all benchmarks """
+
+    def __init__(self, min_seconds: float, selected: list[str]) -> None:
+        self.min_seconds = min_seconds
+        self.selected = selected
+        self.results = []
+
+    def run(self, group: str, name: str, params: dict, func, ops: int = 1) -> None:
+        """ Run a benchmark of the group, ops is the number of operations per call """
+        if self.selected is not None and group not in self.selected:
+            return
+        seconds, calls = measure(func, self.min_seconds)
+        self.results.append({'group': group, 'name': name, 'params': params,
+                             'seconds-per-op': seconds / ops, 'calls': calls})
+        print(f"{group:9} {name:28} {json.dumps(params):48} {seconds / ops * 1e6:12.2f} us/op")
+
+    def page_benchmarks(self, parser: SphParser, page_sizes: list[dict]) -> None:
+        """ Parsing, day extraction and class/field matching """
+        for size in page_sizes:
+            page = generate_page(**size)
+            self.run("parse", "SphHtml", size, lambda: SphHtml(page, parser))
+            self.run("parse", "SphHtml (restricted)", size, lambda: SphHtml(page, parser, True))
+
+            sph_html = SphHtml(page, parser)
+
+            def extract_days():
+                for div in sph_html.get_day_divs():
+                    get_date_str(div)
+                    sph_html.get_info_table(div)
+                    sph_html.get_delegation_table(div)
+            self.run("days", "day extraction", size, extract_days)
+
+            divs = [(get_date_str(div), sph_html.get_info_table(div),
+                     sph_html.get_delegation_table(div)) for div in sph_html.get_day_divs()]
+            self.run("matching", "DelegationTable", size, lambda: [
+                DelegationTable(d, table).search_by_subscriptions(MATCHER)
+                for d, _, table in divs])
+            self.run("matching", "InformationTable", size, lambda: [
+                InformationTable(d, info).search_by_subscriptions(MATCHER)
+                for d, info, _ in divs])
+
+    def hash_benchmarks(self, events: int) -> None:
+        """ Hashing of events """
+        rnd = random.Random(0)
+        sample = [generate_event(rnd) for _ in range(events)]
+        self.run("hashing", "hash_event", {'events': events},
+                 lambda: [hash_event(e) for e in sample], events)
+
+    def hash_store_benchmarks(self, sizes: list[int], lookups: int) -> None:
+        """ Lookups in the hash store with the given number of known hashes """
+        if self.selected is not None and "hashes" not in self.selected:
+            return
+        rnd = random.Random(0)
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as storage_dir:
+                hashes = Hashes("hashes.txt", storage_dir)
+                keys = []
+                start = time.perf_counter()
+                for i in range(size):
+                    key = f"{rnd.getrandbits(128):032x}"
+                    hashes.add(key, str(i), "31.12.2099")
+                    if i % max(1, size // lookups) == 0:
+                        keys.append(key)
+                hashes.commit()
+                logging.info("Added %d hashes in %.1f s", size, time.perf_counter() - start)
+                misses = [f"{rnd.getrandbits(128):032x}" for _ in range(len(keys))]
+                self.run("hashes", "already_known (hit)", {'known': size},
+                         lambda: [hashes.already_known(k) for k in keys], len(keys))
+                self.run("hashes", "already_known (miss)", {'known': size},
+                         lambda: [hashes.already_known(k) for k in misses], len(misses))
+                hashes.connection.close()
+
+
+def generate_event(rnd: random.Random) -> dict[str, str]:
+    """ Event like the delegation table reports it """
+    return {'Datum': date(2024, 3, rnd.randint(1, 28)).strftime("%d.%m.%Y"),
+            'Stunde': str(rnd.randint(1, 10)), 'Klasse': rnd.choice(CLASSES),
+            'Fach': rnd.choice(FIELDS), 'Raum': str(rnd.randint(100, 300)),
+            'Hinweis': rnd.choice(NOTES)}
+
+
+def compare(results: list[dict], baseline_file: str) -> None:
+    """ Print the ratio to the results of an earlier run """
+    with open(baseline_file, "r", encoding="utf-8") as file:
+        baseline = {(r['group'], r['name'], json.dumps(r['params'])): r['seconds-per-op']
+                    for r in json.load(file)['results']}
+    for result in results:
+        key = (result['group'], result['name'], json.dumps(result['params']))
+        if key in baseline:
+            print(f"{result['group']:9} {result['name']:28} {key[2]:48} "
+                  f"{baseline[key] / result['seconds-per-op']:8.2f}x")
+
+
+def main():
+    """ Main method """
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--group", action="append",
+                        choices=["parse", "days", "matching", "hashing", "hashes"],
+                        help="Only run these groups")
+    parser.add_argument("--parser", default=SphParser.DEFAULT_BACKEND)
+    parser.add_argument("--min-seconds", type=float, default=0.5)
+    parser.add_argument("--hash-sizes", type=int, nargs="+",
+                        default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Compare with the JSON results of an earlier run")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    page_sizes = [
+        {'days': 2, 'rows': 20, 'info_rows': 3, 'alerts': 0},
+        {'days': 5, 'rows': 100, 'info_rows': 10, 'alerts': 2},
+        {'days': 10, 'rows': 400, 'info_rows': 40, 'alerts': 5},
+    ]
+    suite = BenchmarkSuite(args.min_seconds, args.group)
+    suite.page_benchmarks(SphParser(args.parser), page_sizes)
+    suite.hash_benchmarks(10000)
+    suite.hash_store_benchmarks(args.hash_sizes, 10000)
+
+    if args.compare is not None:
+        compare(suite.results, args.compare)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({'timestamp': datetime.now().isoformat(),
+                       'python': platform.python_version(),
+                       'parser': args.parser,
+                       'results': suite.results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
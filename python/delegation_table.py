@@ -2,12 +2,13 @@
 
 import bs4.element
 
+from matching.subscription_matcher import SubscriptionMatcher
 from sph.sph_exception import SphException
 
 
 def get_value(cells, idx: int) -> str:
     """ Extract a value or '' """
-    value = cells[idx].find(text=True)
+    value = cells[idx].find(string=True)
     if value is not None:
         return value.strip()
     else:
@@ -17,10 +18,7 @@ def get_value(cells, idx: int) -> str:
 class DelegationTable:
     """ Support the delegation table delivered via SPH """
 
-    def __init__(self, clazz: str, fields: list[str], date: str,
-                 delegation_table: bs4.element.PageElement) -> None:
-        self.clazz = clazz
-        self.fields = fields
+    def __init__(self, date: str, delegation_table: bs4.element.PageElement) -> None:
         self.date = date
         self.table = delegation_table
         self.table_headers = self.table.find_all('th')
@@ -62,24 +60,18 @@ class DelegationTable:
         if self.note2_idx == -1:
             raise SphException("Unable to find second note column")
 
-    def search_by_class(self):
-        """ Search events in the table for the given class or grade """
+    def search_by_subscriptions(self, matcher: SubscriptionMatcher):
+        """ Search events in the table for all subscriptions with their recipients """
         result = []
         for row in self.table.find_all('tr'):
             cells = row.find_all('td')
             if len(cells) > 1:
-                class_txt = get_value(cells, self.class_idx)
-                field_txt = get_value(cells, self.field_idx)
-                if self.clazz in class_txt and self.__field_match(field_txt):
-                    result.append(self.__row_to_dict(cells))
+                recipients = matcher.match_row(get_value(cells, self.class_idx),
+                                               get_value(cells, self.field_idx))
+                if len(recipients) > 0:
+                    result.append((self.__row_to_dict(cells), recipients))
         return result
 
-    def __field_match(self, field: str):
-        for f in self.fields:
-            if field.startswith(f):
-                return True
-        return False
-
     def __row_to_dict(self, cells):
         return {
             'Datum': self.date,
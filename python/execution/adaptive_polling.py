@@ -0,0 +1,128 @@
+""" Polling interval adapted to the history of changes """
+
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from execution.cron_schedule import CronSchedule
+from sph.sph_exception import SphException
+
+
+class AdaptivePolling:
+    """ Polling interval adapted to the history of changes per weekday and hour """
+    # Weight of the history is reduced by this factor each day
+    DECAY = 0.97
+
+    def __init__(self, adaptive_config: dict[str, Any], storage_dir: str) -> None:
+        self.enabled = False
+        self.filename = storage_dir + "/change-history.json"
+        self.min_interval = 10
+        self.max_interval = 120
+        self.daily_budget = 48
+
+        if adaptive_config is not None:
+            if 'enabled' in adaptive_config:
+                self.enabled = adaptive_config['enabled']
+            if 'min-interval' in adaptive_config:
+                self.min_interval = adaptive_config['min-interval']
+            if 'max-interval' in adaptive_config:
+                self.max_interval = adaptive_config['max-interval']
+            if 'daily-budget' in adaptive_config:
+                self.daily_budget = adaptive_config['daily-budget']
+            if not isinstance(self.min_interval, int) or not isinstance(self.max_interval, int) \
+                    or not isinstance(self.daily_budget, int) \
+                    or not 1 <= self.min_interval <= self.max_interval or self.daily_budget < 1:
+                raise SphException(
+                    f"Invalid adaptive execution configuration: {str(adaptive_config)}")
+
+        # Changes per weekday (Monday is 0) and hour
+        self.changes = [[0.0] * 24 for _ in range(7)]
+        self.decayed = date.today().isoformat()
+        self.polls = {}
+        if self.enabled:
+            self.__read_history()
+
+    def record(self, when: datetime, changed: bool) -> None:
+        """ Record a poll and whether the page changed since the last poll """
+        self.__decay(when.date())
+        day = when.date().isoformat()
+        self.polls = {day: self.polls.get(day, 0) + 1}
+        if changed:
+            self.changes[when.weekday()][when.hour] += 1
+            logging.debug("Recorded change on weekday %d at %d:00", when.weekday(), when.hour)
+        self.__write_history()
+
+    def next_poll(self, after: datetime, cron: list[CronSchedule]) -> datetime:
+        """ Time of the next poll after the given time within the cron hours """
+        polls_left = self.daily_budget - self.polls.get(after.date().isoformat(), 0)
+        if polls_left <= 0:
+            logging.info("Daily budget of %d polls used up", self.daily_budget)
+            tomorrow = datetime.combine(after.date() + timedelta(days=1), datetime.min.time())
+            return self.__next_active(tomorrow, cron)
+
+        # Stretch all intervals if polling the rest of the day would exceed the budget
+        expected = 0.0
+        hour = after.replace(minute=0, second=0, microsecond=0)
+        while hour.date() == after.date():
+            if self.__is_active(hour, cron):
+                expected += 60 / self.get_interval(hour)
+            hour = hour + timedelta(hours=1)
+        stretch = max(1.0, expected / polls_left)
+
+        candidate = after + timedelta(minutes=self.get_interval(after) * stretch)
+        return self.__next_active(candidate, cron)
+
+    def get_interval(self, when: datetime) -> float:
+        """ Minutes between two polls at the given time """
+        most_changes = max(max(hours) for hours in self.changes)
+        if most_changes <= 0:
+            return self.max_interval
+        score = self.changes[when.weekday()][when.hour] / most_changes
+        return self.max_interval - (self.max_interval - self.min_interval) * score
+
+    def __is_active(self, when: datetime, cron: list[CronSchedule]) -> bool:
+        if len(cron) == 0:
+            return True
+        return any(c.matches_day(when) and when.hour in c.hours for c in cron)
+
+    def __next_active(self, when: datetime, cron: list[CronSchedule]) -> datetime:
+        """ The given time or the start of the next hour the cron allows polling """
+        if self.__is_active(when, cron):
+            return when
+        hour = when.replace(minute=0, second=0, microsecond=0)
+        for _ in range(CronSchedule.MAX_DAYS * 24):
+            hour = hour + timedelta(hours=1)
+            if self.__is_active(hour, cron):
+                return hour
+        raise SphException("Cron specification does not allow polling any longer")
+
+    def __decay(self, today: date) -> None:
+        days = (today - date.fromisoformat(self.decayed)).days
+        if days <= 0:
+            return
+        factor = self.DECAY ** days
+        self.changes = [[c * factor for c in hours] for hours in self.changes]
+        self.decayed = today.isoformat()
+
+    def __read_history(self) -> None:
+        if not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename, "r", encoding="utf-8") as file:
+                history = json.load(file)
+            self.changes = history['changes']
+            self.decayed = history['decayed']
+            self.polls = history['polls']
+        except (IOError, ValueError, KeyError) as exception:
+            logging.warning("Ignoring change history %s: %s", self.filename, str(exception))
+
+    def __write_history(self) -> None:
+        try:
+            with open(self.filename, "w", encoding="utf-8") as file:
+                json.dump({'changes': self.changes, 'decayed': self.decayed,
+                           'polls': self.polls}, file)
+        except IOError as io_exception:
+            logging.warning("Writing change history %s failed: %s",
+                            self.filename, str(io_exception))
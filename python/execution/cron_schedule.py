@@ -0,0 +1,86 @@
+""" Cron specification with calculation of the next fire time """
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+MONTH_NAMES = ['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+               'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+DAY_NAMES = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+
+def parse_value(value: str, names: list[str], offset: int) -> int:
+    """ Parse a number or a name of a cron field """
+    if value in names:
+        return names.index(value) + offset
+    return int(value)
+
+
+def parse_field(field: str, minimum: int, maximum: int,
+                names: Optional[list[str]] = None, offset: int = 0) -> set[int]:
+    """ Parse a cron field like '*', '*/15', '1-5', 'mon-fri' or '0,30' """
+    names = names if names is not None else []
+    result = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            step = int(step_str)
+            if step < 1:
+                raise ValueError(f"invalid step {step}")
+
+        if part == '*':
+            first, last = minimum, maximum
+        elif '-' in part:
+            first_str, last_str = part.split('-', 1)
+            first = parse_value(first_str, names, offset)
+            last = parse_value(last_str, names, offset)
+        else:
+            first = parse_value(part, names, offset)
+            last = maximum if step > 1 else first
+
+        if first < minimum or last > maximum or first > last:
+            raise ValueError(f"value out of range: {part}")
+        result.update(range(first, last + 1, step))
+    return result
+
+
+class CronSchedule:
+    """ Cron specification with calculation of the next fire time """
+    MAX_DAYS = 5 * 366
+
+    def __init__(self, spec: str) -> None:
+        self.spec = spec
+        fields = spec.lower().split()
+        if len(fields) != 5:
+            raise ValueError(f"expected 5 fields, got {len(fields)}")
+
+        self.minutes = sorted(parse_field(fields[0], 0, 59))
+        self.hours = sorted(parse_field(fields[1], 0, 23))
+        self.days = parse_field(fields[2], 1, 31)
+        self.months = parse_field(fields[3], 1, 12, MONTH_NAMES, 1)
+        # Sunday is 0 or 7 in cron, datetime.weekday() has Monday as 0
+        self.weekdays = {(d + 6) % 7 for d in parse_field(fields[4], 0, 7, DAY_NAMES)}
+        # As in cron, a day matching either field fires if both are restricted
+        self.either_day = '*' not in fields[2] and '*' not in fields[4]
+
+    def matches_day(self, day: datetime) -> bool:
+        """ True if the schedule fires on the day of the given time """
+        if day.month not in self.months:
+            return False
+        if self.either_day:
+            return day.day in self.days or day.weekday() in self.weekdays
+        return day.day in self.days and day.weekday() in self.weekdays
+
+    def next_after(self, after: datetime) -> Optional[datetime]:
+        """ The first fire time after the given time or None """
+        start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(self.MAX_DAYS):
+            if self.matches_day(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day = day + timedelta(days=1)
+        return None
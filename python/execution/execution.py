@@ -3,22 +3,40 @@
 import logging
 import time
 import traceback
-from datetime import datetime
-from typing import Any
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Optional
 
-import pycron
+from execution.adaptive_polling import AdaptivePolling
+from execution.cron_schedule import CronSchedule
+from metrics.metrics import REGISTRY
 from push_over.push_over import PushOver
 from sph.sph_exception import SphException
 
+RUNS = REGISTRY.counter("sph_runs_total", "Executions of the scheduled callback", ("result",))
+RUN_DURATION = REGISTRY.histogram("sph_run_duration_seconds",
+                                  "Duration of the executions of the scheduled callback")
+MISSED_RUNS = REGISTRY.counter("sph_missed_runs_total", "Scheduled executions missed")
+
 
 class Execution:
     """ Period or one-time Execuition of a callback """
+    MISSED_POLICIES = ['coalesce', 'catch-up', 'skip']
+    # Maximum sleep before the next fire time is calculated again,
+    # e.g. after a change of the daylight saving time
+    MAX_SLEEP_SECONDS = 3600
+    # A late slot is still run with the 'skip' policy
+    GRACE_SECONDS = 60
+    MAX_CATCH_UP = 10
 
-    def __init__(self, execution_config: dict[str, Any], push_service: PushOver) -> None:
-        self.interval_seconds = 60
+    def __init__(self, execution_config: dict[str, Any], push_service: Optional[PushOver],
+                 storage_dir: str = ".",
+                 is_check_day: Optional[Callable[[date], bool]] = None) -> None:
         self.is_executing_callback = False
         self.push_service = push_service
+        self.is_check_day = is_check_day
         self.cron = []
+        self.missed = 'coalesce'
+        self.adaptive = AdaptivePolling(None, storage_dir)
 
         if execution_config is not None:
             if 'cron' not in execution_config:
@@ -27,43 +45,133 @@ class Execution:
 
             if execution_config['cron'] is not None:
                 for spec in execution_config['cron']:
-                    self.cron.append(spec.lower())
+                    try:
+                        self.cron.append(CronSchedule(spec))
+                    except ValueError as exc:
+                        raise SphException(
+                            f"Invalid cron specification: {spec} ({str(exc)})") from exc
 
-        for cron_entry in self.cron:
-            try:
-                pycron.is_now(cron_entry)
-            except Exception as exc:
-                raise SphException(
-                    f"Invalid cron specification: {cron_entry} ({str(exc)})") from exc
+            if 'missed' in execution_config:
+                self.missed = execution_config['missed']
+                if self.missed not in self.MISSED_POLICIES:
+                    raise SphException(
+                        f"Invalid policy for missed executions: {self.missed}")
+
+            if 'adaptive' in execution_config:
+                self.adaptive = AdaptivePolling(execution_config['adaptive'], storage_dir)
+
+            if 'skip-free-days' in execution_config:
+                if not isinstance(execution_config['skip-free-days'], bool):
+                    raise SphException(
+                        f"Invalid Execution configuration: {str(execution_config)}")
+                if not execution_config['skip-free-days']:
+                    self.is_check_day = None
 
     def run_scheduled(self, func) -> None:
         """ Run the callback once or periodically """
         self.__run_function(func)
+        if self.adaptive.enabled:
+            # The first check cannot tell reliably whether the page changed
+            self.adaptive.record(datetime.now(), False)
+            self.__run_adaptive(func)
+            return
+
         if len(self.cron) == 0:
             logging.warning("No schedule, executed once!")
             return
 
+        last_slot = datetime.now()
         while True:
-            need_execution = self.__need_execution()
-            if need_execution:
+            next_slot = self.__next_slot(last_slot)
+            if next_slot is None:
+                logging.warning("Schedule does not fire any longer!")
+                return
+            logging.debug("Next execution at %s", next_slot)
+            self.__sleep_until(next_slot)
+
+            due_slots = self.__due_slots(last_slot, datetime.now())
+            if len(due_slots) == 0:
+                continue
+            last_slot = due_slots[-1]
+            for _ in range(self.__get_runs(due_slots)):
                 self.__run_function(func)
 
-            time.sleep(self.interval_seconds)
+    def __run_adaptive(self, func) -> None:
+        """ Run the callback with intervals adapted to the history of changes """
+        while True:
+            next_poll = self.adaptive.next_poll(datetime.now(), self.cron)
+            while next_poll.date() != self.__next_check_day(next_poll.date()):
+                next_day = datetime.combine(self.__next_check_day(next_poll.date()), datetime.min.time())
+                next_poll = self.adaptive.next_poll(next_day, self.cron)
+            logging.debug("Next execution at %s", next_poll)
+            self.__sleep_until(next_poll)
+            changed = self.__run_function(func)
+            self.adaptive.record(datetime.now(), changed is True)
 
-    def __run_function(self, func) -> None:
+    def __next_slot(self, after: datetime) -> Optional[datetime]:
+        while True:
+            next_slots = [c.next_after(after) for c in self.cron]
+            next_slots = [s for s in next_slots if s is not None]
+            if len(next_slots) == 0:
+                return None
+            next_slot = min(next_slots)
+            next_day = self.__next_check_day(next_slot.date())
+            if next_day == next_slot.date():
+                return next_slot
+            # Sleep through holidays and weekends
+            after = datetime.combine(next_day, datetime.min.time()) - timedelta(minutes=1)
+
+    def __next_check_day(self, day: date) -> date:
+        """ The given day or the next day the callback has to be run """
+        if self.is_check_day is None:
+            return day
+        for _ in range(CronSchedule.MAX_DAYS):
+            if self.is_check_day(day):
+                return day
+            day = day + timedelta(days=1)
+        raise SphException("No day to run the callback on found")
+
+    def __due_slots(self, after: datetime, now: datetime) -> list[datetime]:
+        due_slots = []
+        next_slot = self.__next_slot(after)
+        while next_slot is not None and next_slot <= now:
+            due_slots.append(next_slot)
+            next_slot = self.__next_slot(next_slot)
+        return due_slots
+
+    def __get_runs(self, due_slots: list[datetime]) -> int:
+        missed = len(due_slots) - 1
+        if missed > 0:
+            MISSED_RUNS.inc(missed)
+            logging.warning("Missed %d executions since %s (%s)",
+                            missed, due_slots[0], self.missed)
+        if self.missed == 'catch-up':
+            return min(len(due_slots), self.MAX_CATCH_UP)
+        if self.missed == 'skip' \
+                and (datetime.now() - due_slots[-1]).total_seconds() > self.GRACE_SECONDS:
+            return 0
+        return 1
+
+    def __sleep_until(self, target: datetime) -> None:
+        while True:
+            remaining = (target - datetime.now()).total_seconds()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, self.MAX_SLEEP_SECONDS))
+
+    def __run_function(self, func) -> Any:
+        start = time.perf_counter()
         try:
             self.is_executing_callback = True
-            func()
+            result = func()
+            RUNS.labels("success").inc()
+            return result
         except Exception as exc:
+            RUNS.labels("failure").inc()
             traceback.print_exc()
-            self.push_service.send_error(str(exc))
+            if self.push_service is not None:
+                self.push_service.send_error(str(exc))
+            return None
         finally:
             self.is_executing_callback = False
-
-    def __need_execution(self) -> bool:
-        dt = datetime.now()
-        for c in self.cron:
-            if pycron.is_now(c, dt):
-                return True
-
-        return False
+            RUN_DURATION.observe(time.perf_counter() - start)
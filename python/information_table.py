@@ -2,10 +2,12 @@
 
 import bs4.element
 
+from matching.subscription_matcher import SubscriptionMatcher
+
 
 def get_value(cell) -> str:
     """ Extract a value or '' """
-    value = cell.find(text=True)
+    value = cell.find(string=True)
     if value is not None:
         return value.strip()
     else:
@@ -15,36 +17,26 @@ def get_value(cell) -> str:
 class InformationTable:
     """ Support the delegation table delivered via SPH """
 
-    def __init__(self, clazz: str, fields: list[str], date: str,
-                 information_table: bs4.element.PageElement) -> None:
-        self.clazz = clazz
-        self.fields = fields
+    def __init__(self, date: str, information_table: bs4.element.PageElement) -> None:
         self.date = date
         self.table = information_table
 
         # print(self.table)
 
-    def search_by_class_and_fields(self):
-        """ Search events in the table for the given class and fields """
+    def search_by_subscriptions(self, matcher: SubscriptionMatcher):
+        """ Search events in the table for all subscriptions with their recipients """
         result = []
         if self.table is None:
             return result
 
         for row in self.table.find_all('tr'):
-            cells = row.find_all('td')
-            for cell in cells:
+            for cell in row.find_all('td'):
                 info = get_value(cell)
-                if self.__match_class_and_field(info):
-                    result.append(self.__row_to_dict(info))
+                recipients = matcher.match_info(info)
+                if len(recipients) > 0:
+                    result.append((self.__row_to_dict(info), recipients))
         return result
 
-    def __match_class_and_field(self, value: str) -> bool:
-        for f in self.fields:
-            search = f"{self.clazz}{f}"
-            if search in value:
-                return True
-        return False
-
     def __row_to_dict(self, info):
         return {
             'Datum': self.date,
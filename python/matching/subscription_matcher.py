@@ -0,0 +1,164 @@
+""" Match the rows of the Vertretungsplan against the subscriptions of all users """
+
+import re
+from typing import Any, Iterable, Optional
+
+from sph.sph_exception import SphException
+
+
+class Subscription:
+    """ Class or grade and the fields a user is interested in """
+
+    def __init__(self, clazz: str, fields: list[str]) -> None:
+        self.clazz = clazz
+        self.fields = fields
+
+    def __repr__(self) -> str:
+        return f"Subscription({self.clazz}, {self.fields})"
+
+
+def get_subscriptions(push_config: Optional[dict[str, Any]], clazz: Optional[str],
+                      fields: Optional[list[str]]) -> dict[str, list[Subscription]]:
+    """ Subscriptions per push user, users without own subscriptions get class and fields
+        of the configuration. Without push users the subscription is kept for the name '' """
+    default = [] if clazz is None or fields is None else [Subscription(clazz, fields)]
+    users = [] if push_config is None else push_config.get('users') or []
+    if len(users) == 0:
+        return {'': default}
+
+    result = {}
+    for push_user in users:
+        if push_user.get('subscriptions') is None:
+            result[push_user['user']] = default
+            continue
+        subscriptions = []
+        for subscription in push_user['subscriptions']:
+            if not isinstance(subscription, dict) or 'class' not in subscription \
+                    or not isinstance(subscription.get('fields'), list):
+                raise SphException(f"Invalid subscription configuration: {str(subscription)}")
+            subscriptions.append(Subscription(str(subscription['class']),
+                                              [str(f) for f in subscription['fields']]))
+        result[push_user['user']] = subscriptions
+    return result
+
+
+class SubstringIndex:
+    """ Find all keys contained in a text, cost independent of the number of keys """
+
+    def __init__(self, keys) -> None:
+        self.keys = set(keys)
+        self.lengths = sorted({len(key) for key in self.keys})
+
+    def find(self, text: str) -> list[str]:
+        """ All keys that are substrings of the text """
+        found = {}
+        for length in self.lengths:
+            if length > len(text):
+                break
+            for start in range(len(text) - length + 1):
+                key = text[start:start + length]
+                if key in self.keys:
+                    found[key] = True
+        return list(found)
+
+
+class PatternMatcher:
+    """ Find all patterns contained in a text with one compiled regular expression """
+
+    def __init__(self, patterns: Iterable[str], ignore_case: bool = False,
+                 ignore_whitespace: bool = False) -> None:
+        self.ignore_case = ignore_case
+        self.ignore_whitespace = ignore_whitespace
+        # Normalized pattern -> patterns
+        self.patterns: dict[str, list[str]] = {}
+        for pattern in patterns:
+            self.patterns.setdefault(self.normalize(pattern), []).append(pattern)
+        # Empty patterns are contained in every text
+        self.empty = self.patterns.pop("", [])
+
+        # Longest first, the lookahead finds overlapping matches at each position
+        normalized = sorted(self.patterns, key=lambda p: (-len(p), p))
+        self.regex = re.compile("(?=(" + "|".join(re.escape(p) for p in normalized) + "))") \
+            if len(normalized) > 0 else None
+        # Shorter patterns matching at the same position as a longer one
+        self.prefixes = {p: [q for q in normalized if q != p and p.startswith(q)]
+                         for p in normalized}
+
+    def normalize(self, text: str) -> str:
+        """ Text as matched, without whitespace and in lower case if configured """
+        if self.ignore_whitespace:
+            text = "".join(text.split())
+        if self.ignore_case:
+            text = text.casefold()
+        return text
+
+    def find(self, text: str) -> list[str]:
+        """ All patterns contained in the text """
+        if self.regex is None:
+            return list(self.empty)
+        found = set()
+        for match in self.regex.finditer(self.normalize(text)):
+            normalized = match.group(1)
+            if normalized in found:
+                continue
+            found.add(normalized)
+            found.update(self.prefixes[normalized])
+        return self.empty + [pattern for normalized in found for pattern in self.patterns[normalized]]
+
+
+class SubscriptionMatcher:
+    """ All subscriptions compiled into one index by class """
+    MAX_CACHE_SIZE = 10000
+
+    def __init__(self, subscriptions: dict[str, list[Subscription]],
+                 matching_config: Optional[dict[str, Any]] = None) -> None:
+        ignore_case = False
+        ignore_whitespace = False
+        if matching_config is not None:
+            ignore_case = matching_config.get('ignore-case', False)
+            ignore_whitespace = matching_config.get('ignore-whitespace', False)
+            if not isinstance(ignore_case, bool) or not isinstance(ignore_whitespace, bool):
+                raise SphException(f"Invalid info matching configuration: {str(matching_config)}")
+
+        # Class -> fields -> recipients
+        by_class: dict[str, dict[tuple[str, ...], set[str]]] = {}
+        # Class directly followed by the field, as in the info table -> recipients
+        by_info: dict[str, set[str]] = {}
+        for recipient, user_subscriptions in subscriptions.items():
+            for subscription in user_subscriptions:
+                fields = tuple(subscription.fields)
+                by_class.setdefault(subscription.clazz, {}) \
+                    .setdefault(fields, set()).add(recipient)
+                for field in fields:
+                    by_info.setdefault(f"{subscription.clazz}{field}", set()).add(recipient)
+
+        self.by_class = {clazz: list(entries.items()) for clazz, entries in by_class.items()}
+        self.by_info = by_info
+        self.classes = SubstringIndex(self.by_class)
+        self.infos = PatternMatcher(self.by_info, ignore_case, ignore_whitespace)
+        self.cache: dict[tuple[str, str], tuple[str, ...]] = {}
+
+    def match_row(self, class_txt: str, field_txt: str) -> tuple[str, ...]:
+        """ Recipients of a row of the delegation table """
+        key = (class_txt, field_txt)
+        recipients = self.cache.get(key)
+        if recipients is not None:
+            return recipients
+
+        found = set()
+        for clazz in self.classes.find(class_txt):
+            for fields, users in self.by_class[clazz]:
+                if field_txt.startswith(fields):
+                    found |= users
+        recipients = tuple(sorted(found))
+        if len(self.cache) >= self.MAX_CACHE_SIZE:
+            self.cache.clear()
+        self.cache[key] = recipients
+        return recipients
+
+    def match_info(self, info: str) -> tuple[str, ...]:
+        """ Recipients of an entry of the info table """
+        found = set()
+        for pattern in self.infos.find(info):
+            found |= self.by_info[pattern]
+        return tuple(sorted(found))
@@ -0,0 +1,231 @@
+""" Counters, gauges and histograms in the Prometheus text format """
+
+import abc
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def format_value(value: float) -> str:
+    """ Number in the Prometheus text format """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """ Label set in the Prometheus text format """
+    if len(names) == 0:
+        return ""
+    labels = ",".join(f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values))
+    return "{" + labels + "}"
+
+
+def escape_label_value(value: str) -> str:
+    """ Escape backslash, double quote and line feed of a label value """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric(abc.ABC):
+    """ Metric with optional labels """
+    TYPE = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.children: dict[tuple[str, ...], "Metric"] = {}
+
+    def labels(self, *values: str) -> "Metric":
+        """ Metric for the given label values """
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}")
+        with self.lock:
+            child = self.children.get(values)
+            if child is None:
+                child = self.new_child()
+                self.children[values] = child
+            return child
+
+    def label_values(self) -> list[tuple[str, ...]]:
+        """ Label values of the metrics created by labels """
+        with self.lock:
+            return list(self.children)
+
+    def new_child(self) -> "Metric":
+        """ New metric for a set of label values """
+        return type(self)(self.name, self.description)
+
+    def collect(self) -> list[str]:
+        """ Lines of the metric including help and type """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.TYPE}"]
+        if len(self.label_names) == 0:
+            lines.extend(self.samples(self.label_names, ()))
+        else:
+            with self.lock:
+                children = list(self.children.items())
+            for values, child in children:
+                lines.extend(child.samples(self.label_names, values))
+        return lines
+
+    @abc.abstractmethod
+    def samples(self, label_names: tuple[str, ...], label_values: tuple[str, ...]) -> list[str]:
+        """ Sample lines of the metric """
+
+
+class Counter(Metric):
+    """ Monotonically increasing counter """
+    TYPE = "counter"
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, label_names)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """ Increase the counter """
+        with self.lock:
+            self.value += amount
+
+    def samples(self, label_names, label_values) -> list[str]:
+        return [f"{self.name}{format_labels(label_names, label_values)} {format_value(self.value)}"]
+
+
+class Gauge(Metric):
+    """ Value that goes up and down, optionally calculated when collected """
+    TYPE = "gauge"
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, description, label_names)
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        """ Set the gauge """
+        with self.lock:
+            self.value = value
+
+    def set_to_current_time(self) -> None:
+        """ Set the gauge to the current unix time """
+        self.set(time.time())
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """ Calculate the value when collected """
+        self.function = function
+
+    def get(self) -> float:
+        """ Current value """
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+    def samples(self, label_names, label_values) -> list[str]:
+        return [f"{self.name}{format_labels(label_names, label_values)} {format_value(self.get())}"]
+
+
+class Histogram(Metric):
+    """ Distribution of observed values in buckets """
+    TYPE = "histogram"
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def new_child(self) -> "Histogram":
+        return Histogram(self.name, self.description, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        """ Add an observation """
+        idx = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+    def time(self) -> "HistogramTimer":
+        """ Context manager observing its duration """
+        return HistogramTimer(self)
+
+    def samples(self, label_names, label_values) -> list[str]:
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            labels = format_labels(label_names + ("le",), label_values + (format_value(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = format_labels(label_names, label_values)
+        lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class HistogramTimer:
+    """ Observe the duration of a block in a histogram """
+
+    def __init__(self, histogram: Histogram) -> None:
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    """ All metrics of the process """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.metrics: dict[str, Metric] = {}
+
+    def counter(self, name: str, description: str, label_names: tuple[str, ...] = ()) -> Counter:
+        """ Get or create a counter """
+        return self.__register(Counter(name, description, label_names))
+
+    def gauge(self, name: str, description: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        """ Get or create a gauge """
+        return self.__register(Gauge(name, description, label_names))
+
+    def histogram(self, name: str, description: str, label_names: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """ Get or create a histogram """
+        return self.__register(Histogram(name, description, label_names, buckets))
+
+    def collect(self) -> str:
+        """ All metrics in the Prometheus text format """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def __register(self, metric: Metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as {existing.TYPE}")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,117 @@
+""" HTTP endpoint serving the metrics and a health check """
+
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+from metrics.metrics import REGISTRY
+from sph.sph_exception import SphException
+
+STARTED = time.time()
+LAST_SUCCESS = REGISTRY.gauge("sph_last_success_timestamp_seconds",
+                              "Unix time of the last successful check of the SPH", ("tenant",))
+SECONDS_SINCE_SUCCESS = REGISTRY.gauge("sph_seconds_since_last_success",
+                                       "Seconds since the last successful check or the start",
+                                       ("tenant",))
+
+
+def register_tenant(tenant: str) -> None:
+    """ Report the time since the last success of the tenant, also before its first check """
+    LAST_SUCCESS.labels(tenant)
+    SECONDS_SINCE_SUCCESS.labels(tenant).set_function(lambda: get_seconds_since_success(tenant))
+
+
+def get_seconds_since_success(tenant: str) -> float:
+    """ Seconds since the last successful check, since the start if there was none yet """
+    last_success = LAST_SUCCESS.labels(tenant).get()
+    return time.time() - (last_success if last_success > 0 else STARTED)
+
+
+def get_stalest_tenant() -> tuple[Optional[str], float]:
+    """ Tenant with the oldest successful check and the seconds since then """
+    tenants = [values[0] for values in LAST_SUCCESS.label_values()]
+    if len(tenants) == 0:
+        return None, time.time() - STARTED
+    ages = {tenant: get_seconds_since_success(tenant) for tenant in tenants}
+    tenant = max(ages, key=ages.get)
+    return tenant, ages[tenant]
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """ Requests to /metrics and /health """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=redefined-builtin
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """ Serve the metrics or the health check """
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self.__send(200, REGISTRY.collect(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/health":
+            tenant, age = get_stalest_tenant()
+            if age <= self.server.health_max_age:
+                self.__send(200, f"OK, last success of all tenants at most {age:.0f} seconds ago\n")
+            else:
+                self.__send(503, f"No successful check of {tenant} for {age:.0f} seconds\n")
+        else:
+            self.__send(404, "Not found\n")
+
+    def __send(self, status: int, body: str, content_type: str = "text/plain; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsServer:
+    """ HTTP endpoint serving the metrics and a health check """
+
+    def __init__(self, metrics_config: dict[str, Any]) -> None:
+        self.enabled = False
+        self.address = "0.0.0.0"
+        self.port = 9108
+        self.health_max_age = 7200
+        self.server = None
+
+        if metrics_config is not None:
+            if 'enabled' in metrics_config:
+                self.enabled = metrics_config['enabled']
+            if 'address' in metrics_config:
+                self.address = metrics_config['address']
+            if 'port' in metrics_config:
+                self.port = metrics_config['port']
+            if 'health-max-age' in metrics_config:
+                self.health_max_age = metrics_config['health-max-age']
+            if not isinstance(self.port, int) or not isinstance(self.health_max_age, int) \
+                    or self.health_max_age <= 0:
+                raise SphException(f"Invalid metrics configuration: {str(metrics_config)}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """ Serve the metrics in a background thread if enabled """
+        if not self.enabled:
+            return
+        self.server = ThreadingHTTPServer((self.address, self.port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.health_max_age = self.health_max_age
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+        logging.info("Serving metrics at http://%s:%d/metrics", self.address, self.port)
+
+    def stop(self) -> None:
+        """ Stop serving the metrics """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
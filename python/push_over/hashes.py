@@ -1,33 +1,82 @@
-""" Hash File Support """
+""" Hash Store Support """
 
+import ast
 import logging
 import os
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Optional
+
+
+def get_event_date(date_value: Optional[str]) -> Optional[str]:
+    """ Convert the 'Datum' of an event into an ISO date """
+    if date_value is None:
+        return None
+    try:
+        return datetime.strptime(date_value, '%d.%m.%Y').date().isoformat()
+    except ValueError:
+        return None
 
 
 class Hashes:
-    """Hash File Support"""
+    """Hash Store Support"""
 
     def __init__(self, filename: str, storage_dir: str) -> None:
-        if filename.startswith("/"):
-            self.filename = filename
-        else:
-            self.filename = storage_dir + "/" + filename
-        with open(file=self.filename, mode="a", encoding="utf-8"):
-            pass
-        logging.debug("Using hash file %s", self.filename)
-        self.separator = " - "
-        self.hashes = {}
-        with open(self.filename, "r", encoding="utf-8") as file:
-            for line in file.readlines():
-                parts = line.split(self.separator)
-                self.hashes.update({parts[0]: parts[1]})
+        if not filename.startswith("/"):
+            filename = storage_dir + "/" + filename
+        self.filename = os.path.splitext(filename)[0] + ".db"
+        logging.debug("Using hash store %s", self.filename)
+        self.lock = threading.RLock()
+
+        self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, event_date TEXT, added TEXT NOT NULL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS hashes_event_date ON hashes (event_date)")
+        self.connection.commit()
+
+        if filename != self.filename and os.path.exists(filename):
+            self.__migrate(filename)
+        self.commit()
 
     def already_known(self, key):
         """Hash already known"""
-        return key in self.hashes
+        with self.lock:
+            return self.connection.execute(
+                "SELECT 1 FROM hashes WHERE key = ?", (key,)).fetchone() is not None
+
+    def add(self, key, value, event_date: Optional[str] = None):
+        """Add hash, visible to other processes after commit"""
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO hashes (key, value, event_date, added) VALUES (?, ?, ?, ?)",
+                (key, value, get_event_date(event_date), datetime.now().isoformat()))
+
+    def commit(self) -> None:
+        """Write the added hashes and remove hashes of past events"""
+        with self.lock, self.connection:
+            removed = self.connection.execute(
+                "DELETE FROM hashes WHERE event_date < ?", (date.today().isoformat(),)).rowcount
+        if removed > 0:
+            logging.debug("Removed %d hashes of past events", removed)
 
-    def add(self, key, value):
-        """Add hash"""
-        with open(self.filename, "a", encoding="utf-8") as file:
-            file.write(key + self.separator + value + "\n")
-            self.hashes.update({key: value})
+    def __migrate(self, legacy_filename: str) -> None:
+        """Import the hashes of a hash file with lines of 'key - value'"""
+        count = 0
+        with open(legacy_filename, "r", encoding="utf-8") as file:
+            for line in file:
+                parts = line.rstrip("\n").split(" - ", 1)
+                if len(parts) != 2:
+                    continue
+                try:
+                    event_date = ast.literal_eval(parts[1]).get('Datum')
+                except (ValueError, SyntaxError, AttributeError):
+                    event_date = None
+                self.add(parts[0], parts[1], event_date)
+                count += 1
+        self.connection.commit()
+        os.replace(legacy_filename, legacy_filename + ".migrated")
+        logging.info("Migrated %d hashes from %s to %s", count, legacy_filename, self.filename)
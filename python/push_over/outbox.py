@@ -0,0 +1,197 @@
+""" Persistent outbox for push messages """
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable
+
+from sph.sph_exception import SphException
+
+
+class OutboxMessage:
+    """ A message waiting in the outbox for a single user """
+
+    def __init__(self, row: tuple) -> None:
+        self.message_id, self.user, self.message, events, self.attempts = row
+        self.events = [tuple(e) for e in json.loads(events)]
+
+
+class Outbox:
+    """ Persistent outbox for push messages, one entry per user """
+
+    def __init__(self, outbox_config: dict[str, Any], storage_dir: str) -> None:
+        self.enabled = False
+        self.filename = storage_dir + "/outbox.db"
+        self.max_attempts = 10
+        self.backoff_seconds = 30
+        self.max_backoff_seconds = 3600
+
+        if outbox_config is not None:
+            if 'enabled' in outbox_config:
+                self.enabled = outbox_config['enabled']
+            if 'file' in outbox_config:
+                if outbox_config['file'].startswith("/"):
+                    self.filename = outbox_config['file']
+                else:
+                    self.filename = storage_dir + "/" + outbox_config['file']
+            if 'max-attempts' in outbox_config:
+                self.max_attempts = outbox_config['max-attempts']
+            if 'backoff' in outbox_config:
+                self.backoff_seconds = outbox_config['backoff']
+            if not isinstance(self.max_attempts, int) or self.max_attempts < 1 \
+                    or not isinstance(self.backoff_seconds, int) or self.backoff_seconds < 1:
+                raise SphException(f"Invalid outbox configuration: {str(outbox_config)}")
+
+        self.lock = threading.Lock()
+        self.connection = None
+        if not self.enabled:
+            return
+
+        logging.debug("Using outbox %s", self.filename)
+        self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY, user TEXT NOT NULL, message TEXT NOT NULL, "
+                "events TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_attempt REAL NOT NULL, created REAL NOT NULL)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS outbox_next_attempt ON outbox (next_attempt)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS outbox_events ("
+                "key TEXT NOT NULL, message_id INTEGER NOT NULL)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS outbox_events_key ON outbox_events (key)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS outbox_events_message ON outbox_events (message_id)")
+
+    def enqueue(self, users: list[str], message: str, events: list[tuple[str, str, str]]) -> None:
+        """ Queue the message for the users, events are (key, value, date) """
+        now = time.time()
+        with self.lock, self.connection:
+            for user in users:
+                message_id = self.connection.execute(
+                    "INSERT INTO outbox (user, message, events, next_attempt, created) "
+                    "VALUES (?, ?, ?, ?, ?)", (user, message, json.dumps(events), now, now)).lastrowid
+                self.connection.executemany(
+                    "INSERT INTO outbox_events (key, message_id) VALUES (?, ?)",
+                    [(event[0], message_id) for event in events])
+
+    def is_queued(self, key: str) -> bool:
+        """ True if an event with the key waits for delivery """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT 1 FROM outbox_events WHERE key = ?", (key,)).fetchone() is not None
+
+    def size(self) -> int:
+        """ Number of queued messages """
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def get_due(self, now: float) -> list[OutboxMessage]:
+        """ Messages to be sent now """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, user, message, events, attempts FROM outbox "
+                "WHERE next_attempt <= ? ORDER BY id", (now,)).fetchall()
+        return [OutboxMessage(row) for row in rows]
+
+    def get_next_attempt(self):
+        """ Time of the next attempt or None if empty """
+        with self.lock:
+            return self.connection.execute("SELECT MIN(next_attempt) FROM outbox").fetchone()[0]
+
+    def remove(self, message: OutboxMessage) -> list[tuple[str, str, str]]:
+        """ Remove the message, return the events not queued any longer """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM outbox WHERE id = ?", (message.message_id,))
+            self.connection.execute(
+                "DELETE FROM outbox_events WHERE message_id = ?", (message.message_id,))
+            return [e for e in message.events if self.connection.execute(
+                "SELECT 1 FROM outbox_events WHERE key = ?", (e[0],)).fetchone() is None]
+
+    def retry(self, message: OutboxMessage, not_before: float = 0) -> bool:
+        """ Schedule the next attempt with exponential backoff, False if given up """
+        attempts = message.attempts + 1
+        if attempts >= self.max_attempts:
+            return False
+        next_attempt = max(time.time() + self.get_backoff(message.attempts), not_before)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt = ? WHERE id = ?",
+                (attempts, next_attempt, message.message_id))
+        return True
+
+    def get_backoff(self, failures: int) -> float:
+        """ Seconds to wait after the given number of failed attempts """
+        return min(self.backoff_seconds * 2 ** failures, self.max_backoff_seconds)
+
+    def postpone(self, not_before: float) -> None:
+        """ Postpone all messages, e.g. until a rate limit is reset """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE outbox SET next_attempt = ? WHERE next_attempt < ?", (not_before, not_before))
+
+
+class OutboxWorker(threading.Thread):
+    """ Deliver the messages of the outbox in the background """
+
+    def __init__(self, outbox: Outbox,
+                 deliver: Callable[[list[OutboxMessage]], None]) -> None:
+        super().__init__(name="outbox", daemon=True)
+        self.outbox = outbox
+        self.deliver = deliver
+        self.wake_up = threading.Event()
+        self.stopping = False
+
+    def notify(self) -> None:
+        """ New messages have been queued """
+        self.wake_up.set()
+
+    def stop(self, timeout: float) -> None:
+        """ Try to deliver the queued messages within the timeout and stop """
+        self.stopping = True
+        self.wake_up.set()
+        self.join(timeout)
+        if self.is_alive():
+            logging.warning("Stopped outbox with %d messages queued", self.outbox.size())
+
+    def run(self) -> None:
+        failures = 0
+        while True:
+            self.wake_up.clear()
+            try:
+                due = self.outbox.get_due(time.time())
+                if len(due) > 0:
+                    self.deliver(due)
+                    failures = 0
+                    continue
+            except Exception as exc:
+                # The messages stay due, wait instead of retrying them right away
+                backoff = self.outbox.get_backoff(failures)
+                failures += 1
+                logging.error("Failed to deliver outbox, next attempt in %d s: %s",
+                              backoff, str(exc))
+                if not self.__pause(backoff):
+                    return
+                continue
+
+            next_attempt = self.outbox.get_next_attempt()
+            if next_attempt is None and self.stopping:
+                return
+            timeout = 60.0 if next_attempt is None else max(next_attempt - time.time(), 0.1)
+            self.wake_up.wait(timeout)
+
+    def __pause(self, seconds: float) -> bool:
+        """ Wait the seconds ignoring new messages, False if stopped meanwhile """
+        deadline = time.monotonic() + seconds
+        while not self.stopping:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            self.wake_up.wait(remaining)
+            self.wake_up.clear()
+        return False
@@ -1,16 +1,44 @@
 """ Support for sending pushover messages """
 
 import hashlib
-import http.client
 import json
 import logging
-import urllib.parse
+import time
 from datetime import datetime
-from typing import Any
+from typing import Any, Optional
 
+from metrics.metrics import REGISTRY
 from push_over.hashes import Hashes
+from push_over.outbox import Outbox, OutboxMessage, OutboxWorker
+from push_over.push_over_client import PushOverClient, PushOverResult
 from sph.sph_exception import SphException
 
+PUSH_EVENTS = REGISTRY.counter("sph_push_events_total",
+                               "Events passed to the push service, new or already known", ("state",))
+
+
+def split_messages(messages: list[str], max_length: int) -> list[str]:
+    """ Join the messages line by line into as few messages as possible """
+    result = []
+    current = ""
+    for message in messages:
+        while len(message) > max_length:
+            if len(current) > 0:
+                result.append(current)
+                current = ""
+            result.append(message[:max_length])
+            message = message[max_length:]
+        if len(current) == 0:
+            current = message
+        elif len(current) + 1 + len(message) <= max_length:
+            current = current + "\n" + message
+        else:
+            result.append(current)
+            current = message
+    if len(current) > 0:
+        result.append(current)
+    return result
+
 
 def hash_event(event: dict[str, str]) -> str:
     """ Hash the event """
@@ -18,38 +46,41 @@ def hash_event(event: dict[str, str]) -> str:
                        .encode('utf-8')).hexdigest()
 
 
-def send_pushover_to_user(user_key: str, api_token: str, message: str) -> None:
-    """ Send pushover message to user """
-    conn = http.client.HTTPSConnection("api.pushover.net:443")
-    conn.request("POST", "/1/messages.json",
-                 urllib.parse.urlencode({
-                     "token": api_token,
-                     "user": user_key,
-                     "message": message}), {"Content-type": "application/x-www-form-urlencoded"})
-    response = conn.getresponse()
-    if response.getcode() != 200:
-        logging.error("Failed to send pushover message")
-
-
 class PushOver:
     """ Pushover Support """
 
     def __init__(self, push_config: dict[str, Any], storage_dir: str) -> None:
         self.enabled = False
         self.push_users = {}
+        self.batching = False
+        self.max_length = 1024
+        # Batched messages and events per date and recipients
+        self.pending: dict[tuple[str, Optional[tuple[str, ...]]],
+                           list[tuple[str, tuple[str, str, str]]]] = {}
+        self.outbox = Outbox(None, storage_dir)
+        self.outbox_worker = None
 
         if push_config is not None:
             if 'enabled' in push_config:
                 self.enabled = push_config['enabled']
+            if 'batching' in push_config and push_config['batching'] is not None:
+                self.batching = push_config['batching'].get('enabled', False)
+                self.max_length = push_config['batching'].get('max-length', self.max_length)
+                if not isinstance(self.max_length, int) or not 0 < self.max_length <= 1024:
+                    raise SphException(
+                        f"Invalid PushOver batching configuration: {str(push_config['batching'])}")
             if 'users' not in push_config or 'hash-file' not in push_config:
                 raise SphException(
                     f"Invalid PushOver configuration: {str(push_config)}")
 
             self.push_users = push_config['users']
             self.hashes = Hashes(push_config['hash-file'], storage_dir)
+            if self.enabled and 'outbox' in push_config:
+                self.outbox = Outbox(push_config['outbox'], storage_dir)
 
         if not self.enabled:
             logging.info("PushOver Messages are disabled!")
+        self.client = PushOverClient(push_config)
 
         for push_user in self.push_users:
             if 'user' not in push_user or 'user-key' not in push_user or 'api-token' not in push_user:
@@ -59,6 +90,10 @@ class PushOver:
                 logging.info("PushOver User %s added, send-errors = %s",
                              push_user['user'], push_user['send-errors'])
 
+        if self.outbox.enabled:
+            self.outbox_worker = OutboxWorker(self.outbox, self.__deliver)
+            self.outbox_worker.start()
+
     def send_error(self, error_msg: str) -> None:
         """ Send error message """
         error = {
@@ -66,9 +101,49 @@ class PushOver:
             'Fehlermeldung': error_msg
         }
         self.send(error, f"ERROR: {str(error)}", is_error=True)
+        self.flush()
+
+    def flush(self) -> None:
+        """ Finish the events sent since the last flush """
+        if not self.enabled:
+            return
+
+        pending = self.pending
+        self.pending = {}
+        for (date, recipients), entries in pending.items():
+            logging.debug("Sending %d events of %s", len(entries), date)
+            messages = split_messages([message for message, _ in entries], self.max_length)
+            events = [event for _, event in entries]
+            if self.outbox.enabled:
+                for message in messages:
+                    self.outbox.enqueue(self.__get_user_names(False, recipients), message, events)
+                continue
+
+            for event in events:
+                self.hashes.add(*event)
+            for message in messages:
+                try:
+                    self.__send_pushover(message, False, recipients)
+                except Exception:
+                    logging.error("Failed sending events of %s", date)
+        self.hashes.commit()
+        if self.outbox_worker is not None:
+            self.outbox_worker.notify()
+
+    def close(self, timeout: float = 30) -> None:
+        """ Deliver the queued messages within the timeout """
+        if self.outbox_worker is not None:
+            self.outbox_worker.stop(timeout)
+            self.outbox_worker = None
 
-    def send(self, event: dict[str, str], push_message: str, is_error: bool = False) -> None:
-        """ Send message """
+    def deliver_outbox(self) -> None:
+        """ Deliver the due messages of the outbox now, for use without the worker """
+        if self.outbox.enabled:
+            self.__deliver(self.outbox.get_due(time.time()))
+
+    def send(self, event: dict[str, str], push_message: str, is_error: bool = False,
+             recipients: Optional[tuple[str, ...]] = None) -> None:
+        """ Send message to the recipients, all users if not given """
         if not self.enabled:
             logging.info("PushOver Messages NOT delivered: %s", push_message)
             return
@@ -76,26 +151,115 @@ class PushOver:
         try:
             key = hash_event(event)
             value = str(event)
+            date = event.get('Datum', '')
 
-            if not self.hashes.already_known(key):
-                self.hashes.add(key, value)
-                self.__send_pushover(push_message, is_error)
+            if self.__already_known(key):
+                PUSH_EVENTS.labels("duplicate").inc()
+            else:
+                PUSH_EVENTS.labels("new").inc()
+                if self.batching and not is_error:
+                    self.pending.setdefault((date, recipients), []) \
+                        .append((push_message, (key, value, date)))
+                elif self.outbox.enabled:
+                    self.outbox.enqueue(self.__get_user_names(is_error, recipients), push_message,
+                                        [(key, value, date)])
+                    self.outbox_worker.notify()
+                else:
+                    self.hashes.add(key, value, date)
+                    self.__send_pushover(push_message, is_error, recipients)
                 time_str = '{:%Y-%m-%d %H:%M:%S}'.format(datetime.now())
                 logging.info("%s New event: %s - %s", time_str, key, value)
         except Exception:
             logging.error("Failed sending event: %s (is_error=%r)",
                           str(event), is_error)
 
-    def __send_pushover(self, message: str, is_error: bool) -> None:
+    def __already_known(self, key: str) -> bool:
+        if self.hashes.already_known(key):
+            return True
+        for entries in self.pending.values():
+            for _, event in entries:
+                if event[0] == key:
+                    return True
+        return self.outbox.enabled and self.outbox.is_queued(key)
+
+    def __get_push_users(self, is_error: bool,
+                         recipients: Optional[tuple[str, ...]] = None) -> list[dict[str, Any]]:
+        push_users = []
         for push_user in self.push_users:
+            if recipients is not None and push_user['user'] not in recipients:
+                continue
             if not is_error:
                 logging.debug("Sending push message to %s", push_user['user'])
-                send_pushover_to_user(push_user['user-key'],
-                                      push_user['api-token'],
-                                      message)
+                push_users.append(push_user)
             elif is_error == push_user['send-errors']:
                 logging.debug("Sending push error message to %s",
                               push_user['user'])
-                send_pushover_to_user(push_user['user-key'],
-                                      push_user['api-token'],
-                                      message)
+                push_users.append(push_user)
+        return push_users
+
+    def __get_user_names(self, is_error: bool,
+                         recipients: Optional[tuple[str, ...]] = None) -> list[str]:
+        return [push_user['user'] for push_user in self.__get_push_users(is_error, recipients)]
+
+    def __send_pushover(self, message: str, is_error: bool,
+                        recipients: Optional[tuple[str, ...]] = None) -> None:
+        push_users = self.__get_push_users(is_error, recipients)
+        if len(push_users) > 0:
+            self.client.send_to_users(push_users, message)
+
+    def __deliver(self, outbox_messages: list[OutboxMessage]) -> None:
+        """ Deliver messages of the outbox, called by the outbox worker """
+        users_by_name = {push_user['user']: push_user for push_user in self.push_users}
+        by_message: dict[str, dict[str, OutboxMessage]] = {}
+        for outbox_message in outbox_messages:
+            if outbox_message.user not in users_by_name:
+                logging.warning("Dropping message for unknown user %s", outbox_message.user)
+                self.__finish(outbox_message)
+                continue
+            by_message.setdefault(outbox_message.message, {})[outbox_message.user] = outbox_message
+
+        for message, entries in by_message.items():
+            results = self.client.send_to_users([users_by_name[u] for u in entries], message)
+            for result in results:
+                for user in result.users:
+                    self.__handle_result(entries[user], result)
+            # Messages not sent yet wait until the limit is reset
+            if self.__is_rate_limited(results):
+                break
+        self.hashes.commit()
+
+    def __handle_result(self, outbox_message: OutboxMessage, result: PushOverResult) -> None:
+        if result.is_success():
+            self.__finish(outbox_message)
+        elif result.status == 429:
+            self.outbox.retry(outbox_message, self.__get_limit_reset(result))
+        elif result.status is not None and 400 <= result.status < 500:
+            logging.error("Pushover rejected message for %s with HTTP %d, dropping it",
+                          outbox_message.user, result.status)
+            self.__finish(outbox_message)
+        elif not self.outbox.retry(outbox_message):
+            logging.error("Giving up message for %s after %d attempts",
+                          outbox_message.user, outbox_message.attempts + 1)
+            self.__finish(outbox_message)
+
+    def __finish(self, outbox_message: OutboxMessage) -> None:
+        """ Remove from the outbox, events of all users finished are known """
+        for event in self.outbox.remove(outbox_message):
+            self.hashes.add(*event)
+
+    def __is_rate_limited(self, results: list[PushOverResult]) -> bool:
+        limited = [result for result in results if result.status == 429
+                   or result.headers.get('X-Limit-App-Remaining') == '0']
+        if len(limited) == 0:
+            return False
+        reset = max(self.__get_limit_reset(result) for result in limited)
+        logging.warning("Pushover rate limit reached, waiting until %s",
+                        datetime.fromtimestamp(reset).strftime('%Y-%m-%d %H:%M:%S'))
+        self.outbox.postpone(reset)
+        return True
+
+    def __get_limit_reset(self, result: PushOverResult) -> float:
+        try:
+            return float(result.headers.get('X-Limit-App-Reset'))
+        except (TypeError, ValueError):
+            return datetime.now().timestamp() + 3600
@@ -0,0 +1,110 @@
+""" Keep-alive client for the Pushover API """
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics.metrics import REGISTRY
+from sph.sph_exception import SphException
+from tracing.tracer import span
+
+PUSH_DURATION = REGISTRY.histogram("sph_push_duration_seconds",
+                                   "Latency of the requests to the Pushover API")
+PUSH_FAILURES = REGISTRY.counter("sph_push_failures_total",
+                                 "Failed requests to the Pushover API", ("status",))
+
+
+class PushOverResult:
+    """ Result of a single request to the Pushover API """
+
+    def __init__(self, users: list[str], status: Optional[int], latency: float,
+                 headers: Optional[dict[str, str]] = None) -> None:
+        self.users = users
+        self.status = status
+        self.latency = latency
+        self.headers = headers if headers is not None else {}
+
+    def is_success(self) -> bool:
+        """ True if the message was accepted """
+        return self.status == 200
+
+
+class PushOverClient:
+    """ Keep-alive client for the Pushover API """
+    URL = "https://api.pushover.net/1/messages.json"
+
+    def __init__(self, push_config: dict[str, Any]) -> None:
+        self.connect_timeout = 5
+        self.read_timeout = 10
+        self.workers = 4
+        self.multi_recipient = False
+
+        if push_config is not None:
+            if 'connect-timeout' in push_config:
+                self.connect_timeout = push_config['connect-timeout']
+            if 'read-timeout' in push_config:
+                self.read_timeout = push_config['read-timeout']
+            if 'workers' in push_config:
+                self.workers = push_config['workers']
+            if 'multi-recipient' in push_config:
+                self.multi_recipient = push_config['multi-recipient']
+            if not isinstance(self.workers, int) or self.workers < 1:
+                raise SphException(
+                    f"Invalid PushOver workers configuration: {str(self.workers)}")
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.workers))
+        self.pool = None
+
+    def send_to_users(self, push_users: list[dict[str, Any]], message: str) -> list[PushOverResult]:
+        """ Send the message to all given users, in parallel if needed """
+        requests_to_send = self.__get_requests(push_users)
+        if len(requests_to_send) == 1:
+            return [self.__send(*requests_to_send[0], message)]
+
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pushover")
+        futures = [self.pool.submit(self.__send, users, user_keys, api_token, message)
+                   for users, user_keys, api_token in requests_to_send]
+        return [future.result() for future in futures]
+
+    def __get_requests(self, push_users: list[dict[str, Any]]) -> list[tuple[list[str], str, str]]:
+        """ One request per user or, with multi-recipient, per API token """
+        if not self.multi_recipient:
+            return [([u['user']], u['user-key'], u['api-token']) for u in push_users]
+
+        by_token: dict[str, list[dict[str, Any]]] = {}
+        for push_user in push_users:
+            by_token.setdefault(push_user['api-token'], []).append(push_user)
+        return [([u['user'] for u in users], ",".join(u['user-key'] for u in users), api_token)
+                for api_token, users in by_token.items()]
+
+    def __send(self, users: list[str], user_keys: str, api_token: str, message: str) -> PushOverResult:
+        start = time.perf_counter()
+        try:
+            with span("pushover", users=len(users)):
+                response = self.session.post(self.URL, data={
+                    "token": api_token,
+                    "user": user_keys,
+                    "message": message
+                }, timeout=(self.connect_timeout, self.read_timeout))
+            result = PushOverResult(users, response.status_code,
+                                    time.perf_counter() - start, response.headers)
+        except requests.RequestException as exception:
+            logging.error("Failed to send pushover message to %s: %s", ", ".join(users), str(exception))
+            PUSH_FAILURES.labels("error").inc()
+            return PushOverResult(users, None, time.perf_counter() - start)
+
+        PUSH_DURATION.observe(result.latency)
+        if result.is_success():
+            logging.debug("Sent pushover message to %s in %.0f ms",
+                          ", ".join(users), result.latency * 1000)
+        else:
+            logging.error("Failed to send pushover message to %s: HTTP %d in %.0f ms",
+                          ", ".join(users), result.status, result.latency * 1000)
+            PUSH_FAILURES.labels(result.status).inc()
+        return result
@@ -1,7 +1,8 @@
 """ School Holidays """
 
+import bisect
 import logging
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from typing import Any, List
 
 from sph.sph_exception import SphException
@@ -19,32 +20,74 @@ class SchoolHolidays:
     """ School Holidays """
 
     def __init__(self, holiday_config: List[dict[Any, Any]]) -> None:
-        year = date.today().year
-        self.holiday_config = None
-        if holiday_config is not None:
-            for year_config in holiday_config:
-                if year in year_config:
-                    self.holiday_config = year_config[year]
-                if str(year) in year_config:
-                    self.holiday_config = year_config[str(year)]
-
-        if self.holiday_config is not None:
-            for holiday in self.holiday_config:
-                if 'name' not in holiday or 'from' not in holiday or 'to' not in holiday:
-                    raise SphException(f"Invalid holiday configuration: {str(holiday)}")
-
-                holiday['from'] = check_date(holiday['from'])
-                holiday['to'] = check_date(holiday['to'])
+        self.holiday_config = holiday_config
+        self.year = None
+        self.years = set()
+        # Sorted, non-overlapping holidays as start, end and name
+        self.starts: list[date] = []
+        self.ends: list[date] = []
+        self.names: list[str] = []
+        self.__build_index()
 
     def is_holiday_today(self) -> bool:
         """ Checks whether today is a school holiday """
         today = date.today()
-        if self.holiday_config is None:
+        if today.year != self.year:
+            self.__build_index()
+        if today.year not in self.years:
             logging.debug("No school holidays configured for %s", today.year)
             return False
 
-        for holiday in self.holiday_config:
-            if holiday['from'] <= today <= holiday['to']:
-                logging.debug("Today is a holiday in %s", holiday['name'])
-                return True
+        return self.is_holiday(today)
+
+    def is_holiday(self, day: date) -> bool:
+        """ Checks whether the day is a school holiday """
+        idx = bisect.bisect_right(self.starts, day) - 1
+        if idx >= 0 and day <= self.ends[idx]:
+            logging.debug("%s is a holiday in %s", day, self.names[idx])
+            return True
         return False
+
+    def is_school_day(self, day: date) -> bool:
+        """ Checks whether the day is a weekday outside of the holidays """
+        return day.weekday() < 5 and not self.is_holiday(day)
+
+    def is_check_day(self, day: date) -> bool:
+        """ Checks whether the SPH has to be checked on that day: no holiday and
+            no weekend, except for the day before school starts again. Without
+            configured holidays every day is checked """
+        if self.holiday_config is None or len(self.holiday_config) == 0:
+            return True
+        if self.is_holiday(day):
+            return False
+        return day.weekday() < 5 or self.is_school_day(day + timedelta(days=1))
+
+    def __build_index(self) -> None:
+        """ Index the holidays of all configured years """
+        self.year = date.today().year
+        self.years = set()
+        holidays = []
+        if self.holiday_config is not None:
+            for year_config in self.holiday_config:
+                for year, year_holidays in year_config.items():
+                    self.years.add(int(year))
+                    for holiday in year_holidays or []:
+                        if 'name' not in holiday or 'from' not in holiday or 'to' not in holiday:
+                            raise SphException(f"Invalid holiday configuration: {str(holiday)}")
+                        holidays.append((check_date(holiday['from']), check_date(holiday['to']),
+                                         holiday['name']))
+
+        self.starts, self.ends, self.names = [], [], []
+        for start, end, name in sorted(holidays):
+            if len(self.ends) > 0 and start <= self.ends[-1] + timedelta(days=1):
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+                if name != self.names[-1]:
+                    self.names[-1] = f"{self.names[-1]} / {name}"
+                continue
+            self.starts.append(start)
+            self.ends.append(end)
+            self.names.append(name)
+
+        if self.year not in self.years:
+            logging.warning("No school holidays configured for %s", self.year)
@@ -3,8 +3,8 @@
 import base64
 import hashlib
 import logging
+import os
 
-from Cryptodome import Random
 from Cryptodome.Cipher import AES
 from Cryptodome.Cipher import PKCS1_v1_5 as Cipher_PKCS1_v1_5
 from Cryptodome.PublicKey import RSA
@@ -30,7 +30,7 @@ class AesCrypto:
 
     def encrypt(self, message, passphrase):
         """ encrypt message """
-        salt = Random.new().read(8)
+        salt = os.urandom(8)
         key_iv = bytes_to_key(passphrase, salt, 32 + 16)
         key = key_iv[:32]
         iv = key_iv[32:]
@@ -73,6 +73,7 @@ class RsaCrypto:
     """ RSA cryptography """
 
     def __init__(self, public_key: str) -> None:
+        self.fingerprint = hashlib.sha256(public_key.encode("utf-8")).hexdigest()
         self.public_key = RSA.importKey(public_key)
         self.key_length = self.public_key.size_in_bits() + 1
         self.default_length = self.key_length / 8
@@ -32,6 +32,10 @@ class SphConfig:
         """ Get the configuration for key """
         return self.config[key]
 
+    def get_name(self) -> str:
+        """ Name of the configuration file without extension """
+        return os.path.splitext(os.path.basename(self.filename))[0]
+
     def get_storage_directory(self):
         if self.has_key("storage-directory"):
             return self.get("storage-directory").rstrip("/")
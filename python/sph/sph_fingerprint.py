@@ -0,0 +1,88 @@
+""" Detect unchanged pages from SPH """
+
+import hashlib
+import logging
+import os
+import re
+from typing import Any
+
+from sph.sph_exception import SphException
+
+
+class SphFingerprint:
+    """ Fingerprint of the last processed page ignoring volatile parts """
+    VOLATILE_PATTERNS = [
+        r'<script\b.*?</script>',
+        r'<meta[^>]*(csrf|token)[^>]*>',
+        r'<input[^>]*type="hidden"[^>]*>',
+        r'\b\d{1,2}:\d{2}:\d{2}\b',
+    ]
+
+    def __init__(self, fingerprint_config: dict[str, Any], storage_dir: str) -> None:
+        self.enabled = False
+        self.filename = storage_dir + "/fingerprint.txt"
+        patterns = list(self.VOLATILE_PATTERNS)
+
+        if fingerprint_config is not None:
+            if 'enabled' in fingerprint_config:
+                self.enabled = fingerprint_config['enabled']
+            if 'file' in fingerprint_config:
+                if fingerprint_config['file'].startswith("/"):
+                    self.filename = fingerprint_config['file']
+                else:
+                    self.filename = storage_dir + "/" + fingerprint_config['file']
+            if 'ignore' in fingerprint_config and fingerprint_config['ignore'] is not None:
+                patterns.extend(fingerprint_config['ignore'])
+
+        try:
+            self.volatile = re.compile("|".join(f"(?:{p})" for p in patterns),
+                                       re.DOTALL | re.IGNORECASE)
+        except re.error as exc:
+            raise SphException(
+                f"Invalid fingerprint configuration: {str(fingerprint_config)} ({str(exc)})") from exc
+
+        self.last_digest = None
+        self.pending_digest = None
+        self.runs = 0
+        self.unchanged_runs = 0
+        if self.enabled and os.path.exists(self.filename):
+            with open(self.filename, "r", encoding="utf-8") as file:
+                self.last_digest = file.read().strip()
+        # Last page processed, also kept if disabled to tell whether the page changed
+        self.processed_digest = self.last_digest
+        self.changed = False
+
+    def is_unchanged(self, page_text: str) -> bool:
+        """ True if the page matches the last processed one """
+        normalized = " ".join(self.volatile.sub("", page_text).split())
+        self.pending_digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        self.changed = self.pending_digest != self.processed_digest
+        if not self.enabled:
+            return False
+
+        self.runs += 1
+        if self.pending_digest != self.last_digest:
+            return False
+
+        self.unchanged_runs += 1
+        logging.info("Page unchanged, skipping evaluation (%d of %d runs unchanged)",
+                     self.unchanged_runs, self.runs)
+        return True
+
+    def commit(self) -> None:
+        """ Remember the page passed to is_unchanged as processed """
+        if self.pending_digest is None:
+            return
+
+        self.processed_digest = self.pending_digest
+        if not self.enabled:
+            return
+
+        self.last_digest = self.pending_digest
+        self.pending_digest = None
+        try:
+            with open(self.filename, "w", encoding="utf-8") as file:
+                file.write(self.last_digest)
+        except IOError as io_exception:
+            logging.warning("Writing fingerprint file %s failed: %s",
+                            self.filename, str(io_exception))
@@ -1,42 +1,131 @@
 """Evaluate HTMl pages from SPH"""
-import logging
-from bs4 import BeautifulSoup
+import re
 import bs4
 from sph.sph_exception import SphException
 
 from sph.sph_alerts import SphAlerts
+from sph.sph_parser import SphParser
+
+
+START_TAG = re.compile(r"<(div|table)\b([^>]*)>", re.IGNORECASE)
+ATTRIBUTE = re.compile(r"""([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+
+
+def get_relevant_regions(page_text: str) -> str:
+    """Reduce the page to the day containers, their tables and the alerts"""
+    regions = []
+    covered_until = 0
+    for start_tag in START_TAG.finditer(page_text):
+        if start_tag.start() < covered_until or not is_relevant_tag(
+            start_tag.group(1).lower(), start_tag.group(2)
+        ):
+            continue
+        covered_until = get_region_end(page_text, start_tag)
+        regions.append(page_text[start_tag.start():covered_until])
+
+    return "<html><body>" + "\n".join(regions) + "</body></html>"
+
+
+def is_relevant_tag(tag: str, attributes_text: str) -> bool:
+    """True for day containers, info and delegation tables and alerts"""
+    attributes = {}
+    for attribute in ATTRIBUTE.finditer(attributes_text):
+        value = attribute.group(2) or attribute.group(3) or attribute.group(4) or ""
+        attributes[attribute.group(1).lower()] = value
+    return is_relevant_element(tag, attributes)
+
+
+def is_relevant_element(tag: str, attributes: dict[str, str]) -> bool:
+    """True for day containers, info and delegation tables and alerts by their attributes"""
+    element_id = attributes.get("id") or ""
+    classes = (attributes.get("class") or "").split()
+    if tag == "div":
+        return element_id.startswith("tag") or any(
+            c.startswith("alert") for c in classes
+        )
+    return element_id.startswith("vtable") or "infos" in classes
+
+
+def get_region_end(page_text: str, start_tag: re.Match) -> int:
+    """Position after the end tag closing the given start tag"""
+    depth = 1
+    tag = re.compile(rf"<(/?){start_tag.group(1)}\b[^>]*>", re.IGNORECASE)
+    for match in tag.finditer(page_text, start_tag.end()):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return match.end()
+    return len(page_text)
 
 
 class SphHtml:
     """Parse HTML pages from SPH"""
 
-    def __init__(self, page_text: str) -> None:
-        self.soup = BeautifulSoup(page_text, "html.parser")
+    def __init__(
+        self, page_text: str, parser: SphParser = None, restricted: bool = False
+    ) -> None:
+        if parser is None:
+            parser = SphParser()
+        if restricted:
+            page_text = get_relevant_regions(page_text)
+        self.soup = parser.parse(page_text)
+        self.divs: list[bs4.element.Tag] = []
+        self.matching_divs: dict[tuple[str, str], list[bs4.element.Tag]] = {}
+        self.day_divs: list[bs4.element.Tag] = []
+        self.info_tables: dict[int, bs4.element.Tag] = {}
+        self.tables_by_id: dict[str, bs4.element.Tag] = {}
+        self.__build_index()
         self.alerts = SphAlerts(self.get_matching_divs("class", "alert"))
 
     def is_logged_out(self) -> bool:
         """True if logged out"""
         return self.alerts.is_logged_out()
 
-    def write_html_file(self, file_name: str) -> None:
-        """Write page contents to file"""
-        try:
-            with open(file=file_name, mode="w", encoding="utf-8") as file:
-                file.write(self.soup.prettify())
-        except IOError as io_exception:
-            logging.warning(
-                "Writing html file %s failed: %s", file_name, str(io_exception)
-            )
-
     def get_matching_divs(
         self, tag_name: str, tag_begins_with: str
     ) -> list[bs4.element.Tag]:
         """List of matching divs"""
-        result = []
-        for div in self.soup.find_all("div"):
-            if self.__div_tag_matches(div.get(tag_name), tag_begins_with):
-                result.append(div)
-        return result
+        key = (tag_name, tag_begins_with)
+        if key not in self.matching_divs:
+            self.matching_divs[key] = [
+                div
+                for div in self.divs
+                if self.__div_tag_matches(div.get(tag_name), tag_begins_with)
+            ]
+        return self.matching_divs[key]
+
+    def get_day_divs(self) -> list[bs4.element.Tag]:
+        """List of the divs containing a day"""
+        return self.day_divs
+
+    def get_info_table(self, day_div: bs4.element.Tag):
+        """The info table following the day div or None"""
+        return self.info_tables.get(id(day_div))
+
+    def get_delegation_table(self, day_div: bs4.element.Tag):
+        """The delegation table of the day div or None"""
+        return self.tables_by_id.get(day_div.get("id").replace("tag", "vtable"))
+
+    def __build_index(self) -> None:
+        """Index divs and tables in a single pass over the document"""
+        days_without_info = []
+        for element in self.soup.find_all(["div", "table"]):
+            element_id = element.get("id")
+            if element.name == "div":
+                self.divs.append(element)
+                if isinstance(element_id, str) and element_id.startswith("tag"):
+                    self.day_divs.append(element)
+                    days_without_info.append(element)
+                continue
+
+            if isinstance(element_id, str) and element_id not in self.tables_by_id:
+                self.tables_by_id[element_id] = element
+            if "infos" in (element.get("class") or []):
+                # Same as day_div.find_next("table", {"class": "infos"})
+                for day_div in days_without_info:
+                    self.info_tables[id(day_div)] = element
+                days_without_info = []
+
+        self.matching_divs[("id", "tag")] = self.day_divs
 
     def __div_tag_matches(self, tag_value, tag_begins_with: str) -> bool:
         if isinstance(tag_value, list):
@@ -0,0 +1,38 @@
+"""Parser backends for HTML pages from SPH"""
+import logging
+
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+from sph.sph_exception import SphException
+
+
+class SphParser:
+    """Create documents for HTML pages from SPH using the configured backend"""
+
+    # Backend name in the configuration -> BeautifulSoup tree builder
+    BACKENDS = {
+        "html.parser": "html.parser",
+        "lxml": "lxml",
+    }
+    DEFAULT_BACKEND = "html.parser"
+
+    def __init__(self, backend: str = None) -> None:
+        if backend is None:
+            backend = self.DEFAULT_BACKEND
+        if backend not in self.BACKENDS:
+            raise SphException(f"Invalid html parser backend: {backend}")
+
+        if builder_registry.lookup(self.BACKENDS[backend]) is None:
+            logging.warning(
+                "Html parser backend %s is not installed, using %s",
+                backend, self.DEFAULT_BACKEND,
+            )
+            backend = self.DEFAULT_BACKEND
+
+        self.backend = backend
+        logging.debug("Using html parser backend %s", self.backend)
+
+    def parse(self, page_text: str) -> BeautifulSoup:
+        """Parse the page into a document"""
+        return BeautifulSoup(page_text, self.BACKENDS[self.backend])
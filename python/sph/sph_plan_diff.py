@@ -0,0 +1,146 @@
+""" Difference of the delegation rows between consecutive checks """
+
+import json
+import logging
+import os
+from datetime import date, datetime
+from typing import Any
+
+from sph.sph_exception import SphException
+
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+
+def get_row_keys(events: list[tuple[dict[str, str], tuple[str, ...]]]) -> list[str]:
+    """ Stable identity of each row: class, hour and field, numbered if repeated """
+    keys = []
+    seen: dict[str, int] = {}
+    for event, _ in events:
+        key = f"{event.get('Klasse')}|{event.get('Stunde')}|{event.get('Fach')}"
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        keys.append(key if count == 0 else f"{key}#{count}")
+    return keys
+
+
+class SphPlanDiff:
+    """ Report added, changed and removed rows instead of all rows of the plan """
+
+    def __init__(self, diff_config: dict[str, Any], storage_dir: str) -> None:
+        self.enabled = False
+        self.filename = storage_dir + "/plan-state.json"
+
+        if diff_config is not None:
+            if 'enabled' in diff_config:
+                self.enabled = diff_config['enabled']
+            if 'file' in diff_config:
+                if diff_config['file'].startswith("/"):
+                    self.filename = diff_config['file']
+                else:
+                    self.filename = storage_dir + "/" + diff_config['file']
+            if not isinstance(self.enabled, bool):
+                raise SphException(f"Invalid plan diff configuration: {str(diff_config)}")
+
+        # Date -> row key -> [event, recipients] of the last processed page
+        self.days: dict[str, dict[str, list]] = {}
+        self.pending: dict[str, dict[str, list]] = {}
+        # Date -> number of changes reported, part of the events so that a change
+        # happening again is not taken for the one already sent
+        self.sequences: dict[str, int] = {}
+        self.pending_sequences: dict[str, int] = {}
+        if self.enabled:
+            self.__read_state()
+
+    def update_day(self, date_str: str, events: list[tuple[dict[str, str], tuple[str, ...]]]) \
+            -> list[tuple[str, dict[str, str], tuple[str, ...]]]:
+        """ Changes of the rows of the day since the last processed page """
+        previous = self.days.get(date_str)
+        current = {key: [event, list(recipients)]
+                   for key, (event, recipients) in zip(get_row_keys(events), events)}
+        self.pending[date_str] = current
+        if previous is None:
+            return [(ADDED, event, recipients) for event, recipients in events]
+
+        changes = []
+        for key, (event, recipients) in current.items():
+            if key not in previous:
+                changes.append((ADDED, event, tuple(recipients)))
+            elif previous[key][0] != event:
+                changed_fields = [name for name, value in event.items()
+                                  if previous[key][0].get(name) != value]
+                changes.append((CHANGED, {**event, 'Status': 'geändert',
+                                          'Geändert': ", ".join(changed_fields)},
+                                tuple(recipients)))
+        for key, (event, recipients) in previous.items():
+            if key not in current:
+                changes.append((REMOVED, {**event, 'Status': 'entfernt'}, tuple(recipients)))
+        logging.debug("%s: %d rows, %d changes", date_str, len(current), len(changes))
+        return self.__number_changes(date_str, changes)
+
+    def finish(self) -> list[tuple[str, dict[str, str], tuple[str, ...]]]:
+        """ Remember the days updated since the last call, forget past days.
+            Rows of today and future days no longer on the page are removed """
+        if not self.enabled:
+            self.pending = {}
+            return []
+
+        changes = []
+        today = date.today()
+        # A page without any day is not taken as all days being removed
+        if len(self.pending) > 0:
+            for date_str in set(self.days) - set(self.pending):
+                if datetime.strptime(date_str, '%d.%m.%Y').date() < today \
+                        or len(self.days[date_str]) == 0:
+                    continue
+                logging.info("%s is not on the page any longer", date_str)
+                self.pending[date_str] = {}
+                changes.extend(self.__number_changes(date_str, [
+                    (REMOVED, {**event, 'Status': 'entfernt'}, tuple(recipients))
+                    for event, recipients in self.days[date_str].values()]))
+
+        self.days.update(self.pending)
+        self.sequences.update(self.pending_sequences)
+        self.pending = {}
+        self.pending_sequences = {}
+        self.days = {d: rows for d, rows in self.days.items()
+                     if datetime.strptime(d, '%d.%m.%Y').date() >= today}
+        self.sequences = {d: n for d, n in self.sequences.items() if d in self.days}
+        self.__write_state()
+        return changes
+
+    def __number_changes(self, date_str: str, changes: list) -> list:
+        """ Number the changes of the day across checks """
+        sequence = self.pending_sequences.get(date_str, self.sequences.get(date_str, 0))
+        numbered = []
+        for kind, event, recipients in changes:
+            sequence += 1
+            numbered.append((kind, {**event, 'Änderung': str(sequence)}, recipients))
+        self.pending_sequences[date_str] = sequence
+        return numbered
+
+
+    def __read_state(self) -> None:
+        if not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename, "r", encoding="utf-8") as file:
+                state = json.load(file)
+            if 'days' in state and 'sequences' in state:
+                self.days = state['days']
+                self.sequences = state['sequences']
+            else:
+                # Rows by date only, as written before the changes were numbered
+                self.days = state
+        except (IOError, ValueError) as exception:
+            logging.warning("Ignoring plan state %s: %s", self.filename, str(exception))
+
+    def __write_state(self) -> None:
+        try:
+            with open(self.filename + ".tmp", "w", encoding="utf-8") as file:
+                json.dump({'days': self.days, 'sequences': self.sequences}, file,
+                          ensure_ascii=False, separators=(",", ":"))
+            os.replace(self.filename + ".tmp", self.filename)
+        except IOError as io_exception:
+            logging.warning("Writing plan state %s failed: %s", self.filename, str(io_exception))
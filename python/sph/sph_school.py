@@ -1,22 +1,21 @@
 """ Define the school for SPH """
 
-import json
 import logging
 from typing import Any
 
-import requests
-
 from sph.sph_exception import SphException
+from sph.sph_school_directory import SphSchoolDirectory
 
 
 class SphSchool:
     """ SPH School """
 
-    def __init__(self, city: str, name: str, school_id: Any) -> None:
+    def __init__(self, city: str, name: str, school_id: Any,
+                 directory: SphSchoolDirectory = None) -> None:
         self.school_city = city
         self.school_name = name
         self.school_id = school_id
-        self.school_list_url = 'https://startcache.schulportal.hessen.de/exporteur.php?a=schoollist'
+        self.directory = directory if directory is not None else SphSchoolDirectory(None, ".")
 
         if self.school_id is None:
             if self.school_city is None or self.school_name is None:
@@ -33,18 +32,8 @@ class SphSchool:
         return self.school_id
 
     def __search_institution_id(self) -> str:
-        school_list = self.__get_school_list()
-        for school_area in school_list:
-            for school in school_area['Schulen']:
-                if self.school_name in school['Name'] and self.school_city in school['Ort']:
-                    return school['Id']
+        school_id = self.directory.search(self.school_name, self.school_city)
+        if school_id is not None:
+            return school_id
         raise SphException(
             f"Could not find Id for school {self.school_name} in {self.school_city}")
-
-    def __get_school_list(self):
-        session = requests.Session()
-
-        response = session.get(self.school_list_url)
-        response.raise_for_status()
-
-        return json.loads(response.text)
@@ -0,0 +1,156 @@
+""" Cached directory of the schools in the SPH """
+
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Optional
+
+import requests
+
+from sph.sph_exception import SphException
+
+
+def normalize(value: str) -> str:
+    """ Normalize a name for searching: lower case, umlauts and single blanks """
+    value = value.casefold()
+    for umlaut, replacement in (("ä", "ae"), ("ö", "oe"), ("ü", "ue"), ("ß", "ss")):
+        value = value.replace(umlaut, replacement)
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", value).split())
+
+
+class SphSchoolDirectory:
+    """ Cached directory of the schools in the SPH """
+    URL = 'https://startcache.schulportal.hessen.de/exporteur.php?a=schoollist'
+    TIMEOUT = (5, 30)
+
+    def __init__(self, directory_config: dict[str, Any], storage_dir: str) -> None:
+        self.filename = storage_dir + "/schools.json"
+        self.max_age_days = 7
+
+        if directory_config is not None:
+            if 'file' in directory_config:
+                if directory_config['file'].startswith("/"):
+                    self.filename = directory_config['file']
+                else:
+                    self.filename = storage_dir + "/" + directory_config['file']
+            if 'max-age-days' in directory_config:
+                self.max_age_days = directory_config['max-age-days']
+                if not isinstance(self.max_age_days, (int, float)) or self.max_age_days < 0:
+                    raise SphException(
+                        f"Invalid school directory configuration: {str(directory_config)}")
+
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.schools: list[tuple[str, str, str]] = []
+        self.names: list[str] = []
+        self.cities: list[str] = []
+        # Sorted (normalized name token, school index) for prefix search
+        self.tokens: list[tuple[str, int]] = []
+
+    def search(self, name: str, city: str) -> Optional[str]:
+        """ Id of the first school matching the name in the city """
+        with self.lock:
+            if not self.loaded:
+                self.__load()
+                self.loaded = True
+
+        name = normalize(name)
+        city = normalize(city)
+        # First school in list order containing the name, e.g. 'gymnasium' in 'Lessinggymnasium'
+        for idx, school_name in enumerate(self.names):
+            if name in school_name and city in self.cities[idx]:
+                return self.schools[idx][0]
+
+        # Otherwise each word of the name may be abbreviated
+        matches = [i for i in self.__search_tokens(name.split()) if city in self.cities[i]]
+        if len(matches) == 0:
+            return None
+        if len(matches) > 1:
+            logging.info("Found %d schools for %s in %s, using %s",
+                         len(matches), name, city, self.schools[matches[0]][1])
+        return self.schools[matches[0]][0]
+
+    def __search_tokens(self, name_tokens: list[str]) -> list[int]:
+        """ Schools having a token starting with each of the name tokens """
+        result = None
+        for name_token in name_tokens:
+            found = set()
+            idx = bisect.bisect_left(self.tokens, (name_token, -1))
+            while idx < len(self.tokens) and self.tokens[idx][0].startswith(name_token):
+                found.add(self.tokens[idx][1])
+                idx += 1
+            result = found if result is None else result & found
+        return sorted(result) if result is not None else list(range(len(self.schools)))
+
+    def __load(self) -> None:
+        cache = self.__read_cache()
+        if cache is not None and time.time() - cache['fetched'] < self.max_age_days * 86400:
+            logging.debug("Using cached school list %s", self.filename)
+        else:
+            cache = self.__fetch(cache)
+        self.__build_index(cache['schools'])
+
+    def __fetch(self, cache: Optional[dict]) -> dict:
+        headers = {}
+        if cache is not None:
+            if cache.get('etag') is not None:
+                headers['If-None-Match'] = cache['etag']
+            if cache.get('last-modified') is not None:
+                headers['If-Modified-Since'] = cache['last-modified']
+
+        try:
+            with requests.Session() as session:
+                response = session.get(self.URL, headers=headers, timeout=self.TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as exception:
+            if cache is None:
+                raise SphException("Failed to retrieve the school list") from exception
+            logging.warning("Using outdated school list, update failed: %s", str(exception))
+            return cache
+
+        if response.status_code == 304:
+            logging.debug("School list not modified")
+            cache['fetched'] = time.time()
+        else:
+            schools = []
+            for school_area in json.loads(response.text):
+                for school in school_area['Schulen']:
+                    schools.append([school['Id'], school['Name'], school['Ort']])
+            cache = {
+                'fetched': time.time(),
+                'etag': response.headers.get('ETag'),
+                'last-modified': response.headers.get('Last-Modified'),
+                'schools': schools
+            }
+            logging.debug("Retrieved %d schools", len(schools))
+        self.__write_cache(cache)
+        return cache
+
+    def __build_index(self, schools: list[list[str]]) -> None:
+        self.schools = [(str(s[0]), s[1], s[2]) for s in schools]
+        self.names = [normalize(s[1]) for s in self.schools]
+        self.cities = [normalize(s[2]) for s in self.schools]
+        self.tokens = sorted((token, idx) for idx, name in enumerate(self.names)
+                             for token in set(name.split()))
+
+    def __read_cache(self) -> Optional[dict]:
+        if not os.path.exists(self.filename):
+            return None
+        try:
+            with open(self.filename, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (IOError, ValueError) as exception:
+            logging.warning("Ignoring school list %s: %s", self.filename, str(exception))
+            return None
+
+    def __write_cache(self, cache: dict) -> None:
+        try:
+            with open(self.filename + ".tmp", "w", encoding="utf-8") as file:
+                json.dump(cache, file, separators=(",", ":"), ensure_ascii=False)
+            os.replace(self.filename + ".tmp", self.filename)
+        except IOError as io_exception:
+            logging.warning("Writing school list %s failed: %s", self.filename, str(io_exception))
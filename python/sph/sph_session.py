@@ -1,33 +1,82 @@
 """ Provide a session to the school portal SPH """
 
+import codecs
 import json
 import logging
-import math
 import random
+import secrets
+import threading
 import time
 import urllib.parse
+from typing import Iterator, Optional
 
 import requests
 from requests import HTTPError
+from metrics.metrics import BYTES_BUCKETS, REGISTRY
 from sph.crypto import AesCrypto, RsaCrypto
+from sph.sph_session_store import SphSessionStore
+from sph.sph_transport import WIRE_BYTES, SphTransport, get_wire_bytes
+from tracing.tracer import span
 
+LOGINS = REGISTRY.counter("sph_logins_total", "Logins to the SPH: full, restored or failed",
+                          ("result",))
+LOGIN_DURATION = REGISTRY.histogram("sph_login_duration_seconds",
+                                    "Duration of the full logins to the SPH")
+FETCH_DURATION = REGISTRY.histogram("sph_fetch_duration_seconds", "Duration of GET requests to the SPH")
+FETCH_BYTES = REGISTRY.histogram("sph_fetch_bytes", "Size of the responses of the SPH",
+                                 buckets=BYTES_BUCKETS)
+FETCH_FAILURES = REGISTRY.counter("sph_fetch_failures_total", "Failed GET requests to the SPH")
 
-def generate_uuid():
-    """ Generate a random UUID """
-    d = time.time_ns()
-    uuid = ""
 
-    for c in 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx-xxxxxx3xx':
-        r = (d + int(random.random() * 16)) % 16 | 0
-        d = math.floor(d / 16)
+UUID_TEMPLATE = 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx-xxxxxx3xx'
+HEX_DIGITS = '0123456789abcdef'
+
+
+def generate_uuid() -> str:
+    """ Generate a random UUID """
+    uuid = []
+    for c, r in zip(UUID_TEMPLATE, secrets.token_bytes(len(UUID_TEMPLATE))):
         if c == 'x':
-            uuid = uuid + "{0:x}".format(r)
+            uuid.append(HEX_DIGITS[r & 0xf])
         elif c == 'y':
-            uuid = uuid + "{0:x}".format((r & 0x3 | 0x8))
+            uuid.append(HEX_DIGITS[r & 0x3 | 0x8])
         else:
-            uuid = uuid + c
+            uuid.append(c)
+    return "".join(uuid)
+
+
+class PublicKeyCache:
+    """ Public RSA keys of the portals shared by all sessions """
+    MAX_AGE_SECONDS = 86400
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.keys: dict[str, tuple[float, RsaCrypto]] = {}
 
-    return uuid
+    def get(self, base_url: str) -> Optional[RsaCrypto]:
+        """ The cached key of the portal if not yet expired """
+        with self.lock:
+            cached = self.keys.get(base_url)
+        if cached is None or time.monotonic() - cached[0] > self.MAX_AGE_SECONDS:
+            return None
+        return cached[1]
+
+    def put(self, base_url: str, rsa: RsaCrypto) -> None:
+        """ Cache the key of the portal """
+        with self.lock:
+            self.keys[base_url] = (time.monotonic(), rsa)
+
+    def invalidate(self, base_url: str, rsa: RsaCrypto) -> bool:
+        """ Remove the key of the portal, True if it was cached """
+        with self.lock:
+            cached = self.keys.get(base_url)
+            if cached is None or cached[1].fingerprint != rsa.fingerprint:
+                return False
+            del self.keys[base_url]
+            return True
+
+
+PUBLIC_KEYS = PublicKeyCache()
 
 
 class SphSessionException(Exception):
@@ -37,71 +86,198 @@ class SphSessionException(Exception):
 class SphSession:
     """ Provide a session for the SPH """
 
-    def __init__(self, school_id: str, user: str, password: str) -> None:
+    def __init__(self, school_id: str, user: str, password: str,
+                 session_store: Optional[SphSessionStore] = None,
+                 portal_url: Optional[str] = None, login_url: Optional[str] = None,
+                 transport: Optional[SphTransport] = None) -> None:
         self.user = user
         self.password = password
         self.ikey = None
-        self.timeout = 30
-        self.base_domain = 'start.schulportal.hessen.de'
-        self.base_url = f'https://{self.base_domain}'
-        self.login_domain = 'login.schulportal.hessen.de'
-        self.login_base_url = f'https://{self.login_domain}'
+        self.transport = transport if transport is not None else SphTransport()
+        self.timeout = self.transport.timeout
+        self.base_url = (portal_url or 'https://start.schulportal.hessen.de').rstrip("/")
+        self.base_domain = urllib.parse.urlparse(self.base_url).hostname
+        self.login_base_url = (login_url or 'https://login.schulportal.hessen.de').rstrip("/")
+        self.login_domain = urllib.parse.urlparse(self.login_base_url).hostname
         self.school_id = school_id
         self.user_agent = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 ' \
                           'Safari/537.36 '
         self.logged_in = False
+        self.session_store = session_store
 
         self.session = None
         self.session_key = None
 
         self.aes = AesCrypto()
         self.rsa = None
+        self.rsa_from_cache = False
 
     def login(self):
         """ Perform the login procedure if not yet logged in """
         if not self.logged_in:
-            self.session = requests.Session()
-            self.session.headers.update({'upgrade-insecure-requests': '1'})
-            self.session.headers.update({'User-Agent': self.user_agent})
-
-            self.session_key = self.aes.encrypt(generate_uuid().encode("utf-8"),
-                                                generate_uuid().encode("utf-8"))
-            logging.debug("Session Key: %s", self.session_key)
-
-            self.session.cookies.set('i', self.school_id,
-                                     domain=self.base_domain, secure=True)
-            self.session.cookies.set('complianceCookie', 'on',
-                                     domain=self.base_domain)
-
+            # Keep the connections of the last session, but none of its cookies
+            if self.session is None:
+                self.session = self.transport.create_session()
+                self.session.headers.update({'upgrade-insecure-requests': '1'})
+                self.session.headers.update({'User-Agent': self.user_agent})
+            else:
+                self.session.cookies.clear()
+
+            with span("restore-session") as restore_span:
+                restored = self.__restore_session()
+                restore_span.set("restored", restored)
+            if restored:
+                LOGINS.labels("restored").inc()
+                return
+
+            start = time.perf_counter()
+            try:
+                self.__full_login()
+            except Exception:
+                LOGINS.labels("failed").inc()
+                raise
+            LOGIN_DURATION.observe(time.perf_counter() - start)
+            LOGINS.labels("full").inc()
+
+    def __full_login(self):
+        """ Login with user and password and agree on a new session key """
+        self.session_key = self.aes.encrypt(generate_uuid().encode("utf-8"),
+                                            generate_uuid().encode("utf-8"))
+        logging.debug("Session Key: %s", self.session_key)
+
+        self.session.cookies.set('i', self.school_id,
+                                 domain=self.base_domain, secure=True)
+        self.session.cookies.set('complianceCookie', 'on',
+                                 domain=self.base_domain)
+
+        with span("initial-login"):
             self.__initial_login()
 
+        with span("public-key"):
             self.__get_public_key()
-            # self.__print_session('after getting the public key')
-
-            self.__post_rsa_handshake()
-            # self.__print_session('after rsa handshake')
+        # self.__print_session('after getting the public key')
 
+        try:
+            with span("rsa-handshake"):
+                self.__post_rsa_handshake()
+        except SphSessionException:
+            # A key fetched just now is not retried, only an outdated one from the cache
+            if not self.rsa_from_cache or not PUBLIC_KEYS.invalidate(self.base_url, self.rsa):
+                raise
+            logging.info("RSA handshake failed, retrying with a new public key")
+            with span("public-key"):
+                self.__get_public_key()
+            with span("rsa-handshake"):
+                self.__post_rsa_handshake()
+        # self.__print_session('after rsa handshake')
+
+        with span("ajax-login"):
             self.__ajax_login()
-            # self.__print_session('after ajax login')
+        # self.__print_session('after ajax login')
 
-            self.logged_in = True
+        self.logged_in = True
+        self.validated()
 
     def logout(self) -> None:
         """ Logout from the SPH portal if logged in """
+        if self.session_store is not None:
+            self.session_store.clear()
         if self.logged_in:
-            self.get('index.php?logout=1')
             self.logged_in = False
+            self.get('index.php?logout=1')
+            self.transport.forget()
             logging.debug("Logged out")
 
+    def close(self) -> None:
+        """ Keep a cached session for the next run, otherwise logout """
+        if self.session_store is not None and self.session_store.enabled:
+            self.logged_in = False
+            logging.debug("Keeping session for the next run")
+        else:
+            self.logout()
+
+    def validated(self) -> None:
+        """ Mark the session as still being valid """
+        if self.logged_in and self.session_store is not None:
+            cookies = [{'name': c.name, 'value': c.value, 'domain': c.domain,
+                        'path': c.path, 'secure': c.secure} for c in self.session.cookies]
+            self.session_store.save(cookies, self.session_key)
+
     def get(self, relative_url: str) -> str:
         """ Return the response text of the given relative URL """
+        return self.get_response(relative_url).text
+
+    def get_response(self, relative_url: str) -> requests.Response:
+        """ Return the response of the given relative URL """
+        start = time.perf_counter()
+        with span("fetch", url=relative_url) as fetch_span:
+            try:
+                response = self.transport.get(self.session, self.__get_url(relative_url))
+                response.raise_for_status()
+            except HTTPError as exception:
+                FETCH_FAILURES.inc()
+                raise SphSessionException(
+                    f"Failed to retrieve from URL: {relative_url}") from exception
+            except requests.RequestException:
+                FETCH_FAILURES.inc()
+                raise
+            fetch_span.set("status", response.status_code)
+            fetch_span.set("bytes", len(response.content))
+            # Time until the response headers arrived, including connect and TLS
+            fetch_span.set("response-ms", round(response.elapsed.total_seconds() * 1000, 3))
+        FETCH_DURATION.observe(time.perf_counter() - start)
+        FETCH_BYTES.observe(len(response.content))
+        return response
+
+    def iter_text(self, relative_url: str, chunk_size: int = 16384) -> Iterator[str]:
+        """ Return the text of the given relative URL in chunks while it is received """
+        start = time.perf_counter()
         try:
-            response = self.session.get(self.__get_url(relative_url), timeout=self.timeout)
+            response = self.session.get(self.__get_url(relative_url), timeout=self.timeout,
+                                        stream=True)
             response.raise_for_status()
-            return response.text
         except HTTPError as exception:
+            FETCH_FAILURES.inc()
             raise SphSessionException(
                 f"Failed to retrieve from URL: {relative_url}") from exception
+        except requests.RequestException:
+            FETCH_FAILURES.inc()
+            raise
+
+        size = 0
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        try:
+            for chunk in response.iter_content(chunk_size):
+                size += len(chunk)
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+        except requests.RequestException:
+            FETCH_FAILURES.inc()
+            raise
+        finally:
+            response.close()
+        FETCH_DURATION.observe(time.perf_counter() - start)
+        FETCH_BYTES.observe(size)
+        WIRE_BYTES.observe(get_wire_bytes(response))
+
+    def __restore_session(self) -> bool:
+        if self.session_store is None:
+            return False
+        stored_session = self.session_store.load()
+        if stored_session is None:
+            return False
+
+        for cookie in stored_session['cookies']:
+            self.session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'],
+                                     path=cookie['path'], secure=cookie['secure'])
+        self.session_key = stored_session['session-key'].encode("utf-8")
+        self.logged_in = True
+        logging.debug("Reusing stored session")
+        return True
 
     def __initial_login(self):
         payload = 'user2=' + self.user + '&user=' + self.school_id + '.' + self.user + \
@@ -121,9 +297,16 @@ class SphSession:
                 f"Failed to post to URL: {url}; HTTP code: {exception.response.status_code}") from exception
 
     def __get_public_key(self):
+        self.rsa = PUBLIC_KEYS.get(self.base_url)
+        self.rsa_from_cache = self.rsa is not None
+        if self.rsa is not None:
+            logging.debug("Using cached public key %s", self.rsa.fingerprint)
+            return
         response = self.get('ajax.php?f=rsaPublicKey')
         rsp = json.loads(response)
         self.rsa = RsaCrypto(rsp['publickey'])
+        PUBLIC_KEYS.put(self.base_url, self.rsa)
+        logging.debug("Retrieved public key %s", self.rsa.fingerprint)
 
     def __post_rsa_handshake(self):
         # Encrypt the session key with the public RSA key
@@ -145,8 +328,11 @@ class SphSession:
             raise SphSessionException(
                 f"Failed to post to URL: {url}; HTTP code: {exception.response.status_code}") from exception
 
-        rsp = json.loads(response.content)
-        decrypted_challenge = self.aes.decrypt(rsp['challenge'], self.session_key)
+        try:
+            rsp = json.loads(response.content)
+            decrypted_challenge = self.aes.decrypt(rsp['challenge'], self.session_key)
+        except (KeyError, TypeError, ValueError) as exception:
+            raise SphSessionException("Invalid response to the RSA handshake") from exception
 
         if self.session_key != decrypted_challenge:
             raise SphSessionException("Decrypted challenge does not match the session key!")
@@ -0,0 +1,88 @@
+""" Encrypted on-disk store of an SPH session """
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Optional
+
+from sph.crypto import AesCrypto
+from sph.sph_exception import SphException
+
+
+class SphSessionStore:
+    """ Encrypted on-disk store of an SPH session """
+
+    def __init__(self, cache_config: dict[str, Any], storage_dir: str, secret: str) -> None:
+        self.enabled = False
+        self.filename = storage_dir + "/session.cache"
+        self.max_age_seconds = 3600
+        self.aes = AesCrypto()
+
+        if cache_config is not None:
+            if 'enabled' in cache_config:
+                self.enabled = cache_config['enabled']
+            if 'file' in cache_config:
+                if cache_config['file'].startswith("/"):
+                    self.filename = cache_config['file']
+                else:
+                    self.filename = storage_dir + "/" + cache_config['file']
+            if 'max-age' in cache_config:
+                self.max_age_seconds = cache_config['max-age']
+            if not isinstance(self.max_age_seconds, int) or self.max_age_seconds <= 0:
+                raise SphException(
+                    f"Invalid session cache configuration: {str(cache_config)}")
+
+        self.passphrase = hashlib.pbkdf2_hmac(
+            'sha256', secret.encode("utf-8"), self.filename.encode("utf-8"), 100000).hex().encode("utf-8")
+
+        if self.enabled:
+            logging.debug("Using session cache %s", self.filename)
+
+    def load(self) -> Optional[dict[str, Any]]:
+        """ Load the stored session if present and not expired """
+        if not self.enabled or not os.path.exists(self.filename):
+            return None
+
+        try:
+            with open(self.filename, "rb") as file:
+                session = json.loads(self.aes.decrypt(file.read(), self.passphrase))
+        except (OSError, ValueError, AssertionError) as exc:
+            logging.warning("Ignoring unreadable session cache %s: %s", self.filename, str(exc))
+            self.clear()
+            return None
+
+        age = time.time() - session['validated']
+        if age > self.max_age_seconds:
+            logging.debug("Stored session expired %d seconds ago", age - self.max_age_seconds)
+            self.clear()
+            return None
+        return session
+
+    def save(self, cookies: list[dict[str, Any]], session_key: bytes) -> None:
+        """ Store the session as validated now """
+        if not self.enabled:
+            return
+
+        session = {
+            'cookies': cookies,
+            'session-key': session_key.decode("utf-8"),
+            'validated': time.time()
+        }
+        encrypted = self.aes.encrypt(json.dumps(session).encode("utf-8"), self.passphrase)
+        try:
+            fd = os.open(self.filename + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as file:
+                file.write(encrypted)
+            os.replace(self.filename + ".tmp", self.filename)
+        except OSError as exc:
+            logging.warning("Writing session cache %s failed: %s", self.filename, str(exc))
+
+    def clear(self) -> None:
+        """ Remove the stored session """
+        if os.path.exists(self.filename):
+            try:
+                os.remove(self.filename)
+            except OSError as exc:
+                logging.warning("Removing session cache %s failed: %s", self.filename, str(exc))
@@ -0,0 +1,123 @@
+""" Archive of the pages received from SPH """
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any
+
+from sph.sph_exception import SphException
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class SphSnapshots:
+    """ Content-addressed, compressed archive of the pages received from SPH """
+    COMPRESSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+    def __init__(self, snapshot_config: dict[str, Any], storage_dir: str) -> None:
+        self.enabled = False
+        self.latest_filename = storage_dir + "/vertretungsplan.html"
+        self.directory = storage_dir + "/snapshots"
+        self.compression = "gzip"
+        self.max_count = 100
+        self.max_age_days = 30
+
+        if snapshot_config is not None:
+            if 'enabled' in snapshot_config:
+                self.enabled = snapshot_config['enabled']
+            if 'directory' in snapshot_config:
+                if snapshot_config['directory'].startswith("/"):
+                    self.directory = snapshot_config['directory'].rstrip("/")
+                else:
+                    self.directory = storage_dir + "/" + snapshot_config['directory'].rstrip("/")
+            if 'compression' in snapshot_config:
+                self.compression = snapshot_config['compression']
+            if 'max-count' in snapshot_config:
+                self.max_count = snapshot_config['max-count']
+            if 'max-age-days' in snapshot_config:
+                self.max_age_days = snapshot_config['max-age-days']
+
+            if self.compression not in self.COMPRESSIONS \
+                    or not isinstance(self.max_count, int) or self.max_count < 1 \
+                    or not isinstance(self.max_age_days, int) or self.max_age_days < 1:
+                raise SphException(
+                    f"Invalid snapshot configuration: {str(snapshot_config)}")
+
+        if self.compression == "zstd" and zstandard is None:
+            logging.warning("Module zstandard is not installed, using gzip for snapshots")
+            self.compression = "gzip"
+
+        self.index_filename = self.directory + "/index.json"
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            logging.debug("Using snapshot directory %s", self.directory)
+
+    def store(self, content: bytes) -> None:
+        """ Store the page as latest copy and in the archive """
+        try:
+            with open(file=self.latest_filename, mode="wb") as file:
+                file.write(content)
+        except IOError as io_exception:
+            logging.warning("Writing html file %s failed: %s",
+                            self.latest_filename, str(io_exception))
+
+        if not self.enabled:
+            return
+
+        try:
+            self.__archive(content)
+        except (IOError, ValueError) as exception:
+            logging.warning("Archiving snapshot failed: %s", str(exception))
+
+    def __archive(self, content: bytes) -> None:
+        now = time.time()
+        digest = hashlib.sha256(content).hexdigest()
+        index = self.__read_index()
+
+        if digest in index:
+            index[digest]['last-seen'] = now
+            index[digest]['fetches'] += 1
+        else:
+            filename = digest + ".html" + self.COMPRESSIONS[self.compression]
+            with open(self.directory + "/" + filename, "wb") as file:
+                file.write(self.__compress(content))
+            index[digest] = {
+                'file': filename,
+                'size': len(content),
+                'first-seen': now,
+                'last-seen': now,
+                'fetches': 1
+            }
+            logging.debug("New snapshot %s", filename)
+
+        self.__apply_retention(index, now)
+        with open(self.index_filename + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(index, file, indent=1)
+        os.replace(self.index_filename + ".tmp", self.index_filename)
+
+    def __compress(self, content: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().compress(content)
+        return gzip.compress(content)
+
+    def __read_index(self) -> dict[str, dict[str, Any]]:
+        if not os.path.exists(self.index_filename):
+            return {}
+        with open(self.index_filename, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def __apply_retention(self, index: dict[str, dict[str, Any]], now: float) -> None:
+        oldest = now - self.max_age_days * 86400
+        by_age = sorted(index.keys(), key=lambda d: index[d]['last-seen'], reverse=True)
+        for position, digest in enumerate(by_age):
+            if position >= self.max_count or index[digest]['last-seen'] < oldest:
+                filename = self.directory + "/" + index.pop(digest)['file']
+                if os.path.exists(filename):
+                    os.remove(filename)
+                logging.debug("Removed snapshot %s", filename)
@@ -0,0 +1,155 @@
+"""Evaluate HTML pages from SPH while they are received"""
+import hashlib
+from html.parser import HTMLParser
+from typing import Optional
+
+import bs4
+
+from sph.sph_alerts import SphAlerts
+from sph.sph_html import is_relevant_element
+from sph.sph_parser import SphParser
+
+
+class RegionCollector(HTMLParser):
+    """Collect the markup of day containers, info and delegation tables and alerts"""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.regions: list[str] = []
+        self.markup: list[str] = []
+        self.region_tag: Optional[str] = None
+        self.depth = 0
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if self.region_tag is None:
+            if tag not in ("div", "table") or not is_relevant_element(tag, dict(attrs)):
+                return
+            self.region_tag = tag
+        if tag == self.region_tag:
+            self.depth += 1
+        self.markup.append(self.get_starttag_text())
+
+    def handle_startendtag(self, tag, attrs) -> None:
+        if self.region_tag is not None:
+            self.markup.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag) -> None:
+        if self.region_tag is None:
+            return
+        self.markup.append(f"</{tag}>")
+        if tag == self.region_tag:
+            self.depth -= 1
+            if self.depth == 0:
+                self.regions.append("".join(self.markup))
+                self.markup = []
+                self.region_tag = None
+
+    def handle_data(self, data) -> None:
+        if self.region_tag is not None:
+            self.markup.append(data)
+
+    def handle_entityref(self, name) -> None:
+        if self.region_tag is not None:
+            self.markup.append(f"&{name};")
+
+    def handle_charref(self, name) -> None:
+        if self.region_tag is not None:
+            self.markup.append(f"&#{name};")
+
+    def take_regions(self) -> list[str]:
+        """The regions completed since the last call"""
+        regions = self.regions
+        self.regions = []
+        return regions
+
+
+class SphStreamDay:
+    """A day container with its info and delegation table"""
+
+    def __init__(self, div: bs4.element.Tag, info_table: Optional[bs4.element.Tag],
+                 delegation_table: Optional[bs4.element.Tag]) -> None:
+        self.div = div
+        self.info_table = info_table
+        self.delegation_table = delegation_table
+        self.has_info = info_table is not None
+
+
+class SphStreamHtml:
+    """Parse HTML pages from SPH in chunks, days are returned once complete"""
+
+    def __init__(self, parser: SphParser = None) -> None:
+        self.parser = parser if parser is not None else SphParser()
+        self.collector = RegionCollector()
+        self.logged_out = False
+        self.pending: list[SphStreamDay] = []
+        # Delegation tables of the days not yet returned
+        self.tables_by_id: dict[str, bs4.element.Tag] = {}
+        self.seen_table_ids: set[str] = set()
+        self.digest = hashlib.sha256()
+
+    def feed(self, chunk: str) -> list[SphStreamDay]:
+        """Parse the next chunk of the page, the days completed by it"""
+        self.collector.feed(chunk)
+        for region in self.collector.take_regions():
+            self.__add_region(region)
+        return self.__take_days(False)
+
+    def close(self) -> list[SphStreamDay]:
+        """End of the page, all remaining days"""
+        self.collector.close()
+        for region in self.collector.take_regions():
+            self.__add_region(region)
+        return self.__take_days(True)
+
+    def is_logged_out(self) -> bool:
+        """True if logged out, final after close"""
+        return self.logged_out
+
+    def get_digest(self) -> str:
+        """Hash of the days, tables and alerts received so far"""
+        return self.digest.hexdigest()
+
+    def __add_region(self, region: str) -> None:
+        self.digest.update(region.encode("utf-8"))
+        soup = self.parser.parse(region)
+        element = soup.find(["div", "table"])
+        if element is None:
+            return
+
+        # Alerts are evaluated right away, keeping them would keep their region
+        alerts = [div for div in soup.find_all("div")
+                  if any(c.startswith("alert") for c in div.get("class") or [])]
+        if len(alerts) > 0 and SphAlerts(alerts).is_logged_out():
+            self.logged_out = True
+        for table in soup.find_all("table"):
+            table_id = table.get("id")
+            if isinstance(table_id, str) and table_id.startswith("vtable") \
+                    and table_id not in self.seen_table_ids:
+                self.seen_table_ids.add(table_id)
+                self.tables_by_id[table_id] = table
+
+        info_table = soup.find("table", {"class": "infos"})
+        if info_table is not None:
+            # Same as day_div.find_next("table", {"class": "infos"}) for earlier days
+            for day in self.pending:
+                if not day.has_info:
+                    day.info_table = info_table
+                    day.has_info = True
+
+        element_id = element.get("id")
+        if element.name == "div" and isinstance(element_id, str) and element_id.startswith("tag"):
+            self.pending.append(SphStreamDay(element, info_table, None))
+
+    def __take_days(self, final: bool) -> list[SphStreamDay]:
+        """Days in page order with info and delegation table, all if final"""
+        days = []
+        while len(self.pending) > 0:
+            day = self.pending[0]
+            table_id = day.div.get("id").replace("tag", "vtable")
+            day.delegation_table = self.tables_by_id.get(table_id)
+            if not final and (not day.has_info or day.delegation_table is None):
+                break
+            # Returned days are not kept, memory is bounded by the days not yet complete
+            self.tables_by_id.pop(table_id, None)
+            days.append(self.pending.pop(0))
+        return days
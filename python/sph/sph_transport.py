@@ -0,0 +1,129 @@
+""" HTTP transport to the SPH: retries, compression, timeouts and conditional requests """
+
+import logging
+import threading
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics.metrics import BYTES_BUCKETS, REGISTRY
+from sph.sph_exception import SphException
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+WIRE_BYTES = REGISTRY.histogram("sph_fetch_wire_bytes",
+                                "Size of the responses of the SPH as transferred",
+                                buckets=BYTES_BUCKETS)
+NOT_MODIFIED = REGISTRY.counter("sph_fetch_not_modified_total",
+                                "GET requests answered with 304 Not Modified")
+
+
+def get_wire_bytes(response: requests.Response) -> int:
+    """ Bytes of the body read from the connection, compressed if the portal compressed """
+    try:
+        return response.raw.tell()
+    except (AttributeError, OSError):
+        return len(response.content)
+
+
+class SphTransport:
+    """ Sessions with connection reuse, GET retries and validators of the pages """
+
+    def __init__(self, transport_config: Optional[dict[str, Any]] = None) -> None:
+        self.connect_timeout = 5
+        self.read_timeout = 30
+        self.retries = 2
+        self.backoff = 0.5
+        self.conditional = True
+
+        if transport_config is not None:
+            if 'connect-timeout' in transport_config:
+                self.connect_timeout = transport_config['connect-timeout']
+            if 'read-timeout' in transport_config:
+                self.read_timeout = transport_config['read-timeout']
+            if 'retries' in transport_config:
+                self.retries = transport_config['retries']
+            if 'backoff' in transport_config:
+                self.backoff = transport_config['backoff']
+            if 'conditional-get' in transport_config:
+                self.conditional = transport_config['conditional-get']
+            if not isinstance(self.connect_timeout, (int, float)) or self.connect_timeout <= 0 \
+                    or not isinstance(self.read_timeout, (int, float)) or self.read_timeout <= 0 \
+                    or not isinstance(self.retries, int) or self.retries < 0 \
+                    or not isinstance(self.backoff, (int, float)) or self.backoff < 0 \
+                    or not isinstance(self.conditional, bool):
+                raise SphException(f"Invalid transport configuration: {str(transport_config)}")
+
+        self.timeout = (self.connect_timeout, self.read_timeout)
+        self.accept_encoding = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+        # URL -> last complete response carrying an ETag or Last-Modified
+        self.lock = threading.Lock()
+        self.validated: dict[str, requests.Response] = {}
+
+    def create_session(self) -> requests.Session:
+        """ Session sharing one connection pool for the login and the portal host """
+        session = requests.Session()
+        adapter = HTTPAdapter(max_retries=self.__create_retry())
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({'Accept-Encoding': self.accept_encoding})
+        return session
+
+    def get(self, session: requests.Session, url: str) -> requests.Response:
+        """ GET the URL, the last response if the portal reports it as not modified """
+        cached = self.__get_cached(url)
+        headers = {}
+        if cached is not None:
+            if 'ETag' in cached.headers:
+                headers['If-None-Match'] = cached.headers['ETag']
+            if 'Last-Modified' in cached.headers:
+                headers['If-Modified-Since'] = cached.headers['Last-Modified']
+
+        response = session.get(url, headers=headers, timeout=self.timeout)
+        WIRE_BYTES.observe(get_wire_bytes(response))
+        if response.status_code == 304 and cached is not None:
+            NOT_MODIFIED.inc()
+            logging.debug("Not modified: %s", url)
+            return cached
+
+        if self.conditional and response.status_code == 200 \
+                and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+            with self.lock:
+                self.validated[url] = response
+        return response
+
+    def forget(self) -> None:
+        """ Drop the kept responses, e.g. after a logout """
+        with self.lock:
+            self.validated = {}
+
+    def __get_cached(self, url: str) -> Optional[requests.Response]:
+        if not self.conditional:
+            return None
+        with self.lock:
+            return self.validated.get(url)
+
+    def __create_retry(self) -> Retry:
+        """ Retry idempotent requests on connection errors and overloaded portals """
+        settings = {
+            'total': self.retries,
+            'connect': self.retries,
+            'read': self.retries,
+            'status': self.retries,
+            'backoff_factor': self.backoff,
+            'status_forcelist': (502, 503, 504),
+            'allowed_methods': frozenset(["GET", "HEAD"]),
+            'raise_on_status': False,
+            'respect_retry_after_header': True,
+        }
+        try:
+            # Spread the retries of many accounts hit by the same outage
+            return Retry(backoff_jitter=self.backoff, **settings)
+        except TypeError:
+            # urllib3 before 2.0 has no jitter
+            return Retry(**settings)
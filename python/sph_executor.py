@@ -0,0 +1,293 @@
+""" Executing the checks in the SPH """
+
+import logging
+import traceback
+from datetime import datetime
+
+from delegation_table import DelegationTable
+from execution.execution import Execution
+from information_table import InformationTable
+from matching.subscription_matcher import SubscriptionMatcher, get_subscriptions
+from metrics.metrics import COUNT_BUCKETS, REGISTRY
+from metrics.metrics_server import LAST_SUCCESS, register_tenant
+from push_over.push_over import PushOver
+from school_holidays.school_holidays import SchoolHolidays
+from sph.sph_config import SphConfig
+from sph.sph_exception import SphException, SphLoggedOutException
+from sph.sph_fingerprint import SphFingerprint
+from sph.sph_html import SphHtml
+from sph.sph_parser import SphParser
+from sph.sph_plan_diff import CHANGED, REMOVED, SphPlanDiff
+from sph.sph_school import SphSchool
+from sph.sph_school_directory import SphSchoolDirectory
+from sph.sph_session import SphSession
+from sph.sph_session import SphSessionException
+from sph.sph_session_store import SphSessionStore
+from sph.sph_snapshots import SphSnapshots
+from sph.sph_stream_html import SphStreamHtml
+from sph.sph_transport import SphTransport
+from tracing.tracer import Tracer, span
+
+CHECKS = REGISTRY.counter("sph_checks_total", "Checks of the SPH: success, failure or holiday",
+                          ("result",))
+PARSE_DURATION = REGISTRY.histogram("sph_parse_duration_seconds",
+                                    "Duration of parsing the Vertretungsplan")
+EVENTS = REGISTRY.histogram("sph_events_found", "Events found for the class per check",
+                            buckets=COUNT_BUCKETS)
+
+
+class SphExecutor:
+    """Executing the checks in the SPH"""
+
+    def __init__(self, config: SphConfig, school_directory: SphSchoolDirectory = None) -> None:
+        self.config = config
+        self.tenant = config.get_name()
+        register_tenant(self.tenant)
+        if school_directory is None:
+            school_directory = SphSchoolDirectory(config["school-directory"],
+                                                  self.config.get_storage_directory())
+        self.school = SphSchool(
+            city=config["school-city"],
+            name=config["school-name"],
+            school_id=config["school-id"],
+            directory=school_directory,
+        )
+        self.holiday = SchoolHolidays(config["school-holidays"])
+        self.push_service = PushOver(config["push-over"], self.config.get_storage_directory())
+        self.execution = Execution(config["execution"], self.push_service,
+                                   self.config.get_storage_directory(),
+                                   self.holiday.is_check_day)
+        self.fingerprint = SphFingerprint(config["fingerprint"], self.config.get_storage_directory())
+        self.parser = SphParser(config["html-parser"])
+        self.restricted_parse = config["html-restricted-parse"] is True
+        self.streaming = config["html-streaming"] is True
+        self.stream_digest = None
+        self.snapshots = SphSnapshots(config["snapshots"], self.config.get_storage_directory())
+        self.tracer = Tracer(config["tracing"], self.config.get_storage_directory())
+        self.plan_diff = SphPlanDiff(config["plan-diff"], self.config.get_storage_directory())
+        self.matcher = SubscriptionMatcher(
+            get_subscriptions(config["push-over"], config["class"], config["fields"]),
+            config["info-matching"])
+
+        self.session = SphSession(
+            school_id=self.school.get_id(),
+            user=config["user"],
+            password=config["password"],
+            session_store=SphSessionStore(
+                config["session-cache"],
+                self.config.get_storage_directory(),
+                f"{self.school.get_id()}.{config['user']}.{config['password']}",
+            ),
+            portal_url=config["portal-url"],
+            login_url=config["login-url"],
+            transport=SphTransport(config["transport"]),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_) -> None:
+        logging.info("Exiting SPH executor ...")
+        self.close()
+
+    def run(self) -> None:
+        """Run the SPH checks scheduled or once"""
+        self.execution.run_scheduled(self.check)
+
+    def check(self) -> bool:
+        """Run a single check of the SPH, True if the page changed"""
+        self.fingerprint.changed = False
+        if self.holiday.is_holiday_today():
+            CHECKS.labels("holiday").inc()
+            self.logout()
+            return False
+
+        logging.info("Checking SPH ...")
+
+        with self.tracer.trace("check") as trace:
+            try:
+                with span("check-sph", attempt=1):
+                    success = self.__check_sph()
+                if not success:
+                    logging.info("Checking SPH ... trying once more")
+                    with span("check-sph", attempt=2):
+                        success = self.__check_sph()
+            finally:
+                with span("push-flush"):
+                    self.push_service.flush()
+            trace.set("success", success)
+
+        if success:
+            CHECKS.labels("success").inc()
+            LAST_SUCCESS.labels(self.tenant).set_to_current_time()
+        else:
+            CHECKS.labels("failure").inc()
+
+        logging.info("Checking SPH ... done")
+        return self.fingerprint.changed
+
+    def logout(self) -> None:
+        """Logout from the SPH if logged in"""
+        try:
+            self.session.logout()
+        except SphSessionException as exception:
+            logging.error("Failed to logout: %s", str(exception))
+
+    def close(self) -> None:
+        """Keep the session for the next run if cached, otherwise logout"""
+        try:
+            self.session.close()
+        except SphSessionException as exception:
+            logging.error("Failed to logout: %s", str(exception))
+        self.push_service.close()
+        self.tracer.close()
+
+    def __check_sph(self) -> bool:
+        if self.__login():
+            try:
+                self.__parse_delegation_html()
+                return True
+            except SphLoggedOutException as exception:
+                logging.error("Failed to process html: %s", str(exception))
+                self.logout()
+            except SphException as exception:
+                traceback.print_exc()
+                logging.error("Failed to process html: %s", str(exception))
+                self.logout()
+
+        return False
+
+    def __login(self) -> bool:
+        try:
+            with span("login"):
+                self.session.login()
+            return True
+        except SphSessionException as exception:
+            logging.error("Failed to login: %s", str(exception))
+            return False
+
+    def __parse_delegation_html(self):
+        if self.streaming:
+            self.__parse_delegation_stream()
+            return
+
+        delegation_txt = self.__get_delegation_txt()
+        with span("fingerprint") as fingerprint_span:
+            unchanged = self.fingerprint.is_unchanged(delegation_txt)
+            fingerprint_span.set("unchanged", unchanged)
+        if unchanged:
+            self.session.validated()
+            return
+
+        sph_html = self.__get_delegation_html(delegation_txt)
+        events = 0
+        for div in sph_html.get_day_divs():
+            events += self.__process_day(div, sph_html.get_info_table(div),
+                                         sph_html.get_delegation_table(div))
+
+        EVENTS.observe(events)
+        self.__finish_plan_diff()
+        self.fingerprint.commit()
+
+    def __parse_delegation_stream(self):
+        """Process each day as soon as it is received, without fingerprint and snapshots"""
+        stream_html = SphStreamHtml(self.parser)
+        events = 0
+        with span("stream", parser=self.parser.backend) as stream_span:
+            try:
+                for chunk in self.session.iter_text("vertretungsplan.php"):
+                    for day in stream_html.feed(chunk):
+                        events += self.__process_day(day.div, day.info_table,
+                                                     day.delegation_table)
+            except SphSessionException as exception:
+                raise SphException("Failed to get delegation html") from exception
+            for day in stream_html.close():
+                events += self.__process_day(day.div, day.info_table, day.delegation_table)
+            stream_span.set("events", events)
+
+        if stream_html.is_logged_out():
+            raise SphLoggedOutException("Not logged in any longer!")
+        self.session.validated()
+        self.fingerprint.changed = stream_html.get_digest() != self.stream_digest
+        self.stream_digest = stream_html.get_digest()
+        EVENTS.observe(events)
+        self.__finish_plan_diff()
+
+    def __finish_plan_diff(self) -> None:
+        """Report the rows of days no longer on the page"""
+        for kind, event, recipients in self.plan_diff.finish():
+            self.push_service.send(event, self.__push_diff_message(kind, event),
+                                   recipients=recipients)
+
+    def __process_day(self, div, info_element, table_element) -> int:
+        """Push the events of a day, the number of events found"""
+        date = datetime.strptime(
+            div.get("id").replace("tag", ""), "%d_%m_%Y"
+        ).date()
+        date_str = date.strftime("%d.%m.%Y")
+
+        if date < datetime.now().date():
+            logging.info("Skipping %s ...", date.strftime("%d.%m.%Y"))
+            return 0
+
+        events = 0
+        with span("day", date=date_str):
+            # Process info table
+            with span("info-table"):
+                info_table = InformationTable(date_str, info_element)
+                info_events = info_table.search_by_subscriptions(self.matcher)
+            for info_event, recipients in info_events:
+                events += 1
+                self.push_service.send(info_event, self.__push_info_message(info_event),
+                                       recipients=recipients)
+
+            # Process delegation table
+            with span("delegation-table"):
+                table = DelegationTable(date_str, table_element)
+                table_events = table.search_by_subscriptions(self.matcher)
+            events += len(table_events)
+            if self.plan_diff.enabled:
+                for kind, event, recipients in self.plan_diff.update_day(date_str, table_events):
+                    self.push_service.send(event, self.__push_diff_message(kind, event),
+                                           recipients=recipients)
+            else:
+                for event, recipients in table_events:
+                    self.push_service.send(event, self.__push_message(event),
+                                           recipients=recipients)
+        return events
+
+    def __get_delegation_txt(self) -> str:
+        try:
+            response = self.session.get_response("vertretungsplan.php")
+            with span("snapshot"):
+                self.snapshots.store(response.content)
+            return response.text
+        except SphSessionException as exception:
+            raise SphException("Failed to get delegation html") from exception
+
+    def __get_delegation_html(self, delegation_txt: str) -> SphHtml:
+        with PARSE_DURATION.time(), span("parse", parser=self.parser.backend):
+            sph_html = SphHtml(delegation_txt, self.parser, self.restricted_parse)
+        if sph_html.is_logged_out():
+            raise SphLoggedOutException("Not logged in any longer!")
+        self.session.validated()
+        return sph_html
+
+    def __push_info_message(self, event: dict[str, str]) -> str:
+        return (
+            f"{event['Datum']}: {event['Info']}"
+        )
+
+    def __push_message(self, event: dict[str, str]) -> str:
+        return (
+            f"{event['Datum']}: {event['Hinweis']} im Fach {event['Fach']} "
+            f"in Stunde {event['Stunde']}"
+        )
+
+    def __push_diff_message(self, kind: str, event: dict[str, str]) -> str:
+        if kind == CHANGED:
+            changes = ", ".join(f"{name} {event[name]}" for name in event['Geändert'].split(", "))
+            return f"{self.__push_message(event)} (geändert: {changes})"
+        if kind == REMOVED:
+            return f"{self.__push_message(event)} (entfernt)"
+        return self.__push_message(event)
@@ -0,0 +1,133 @@
+""" Executing the checks in the SPH for many accounts in one process """
+
+import logging
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date
+
+from execution.execution import Execution
+from sph.sph_config import SphConfig
+from sph.sph_exception import SphException
+from sph.sph_school_directory import SphSchoolDirectory
+from sph_executor import SphExecutor
+
+
+def get_config_files(config_files: list[str], config_dir: str) -> list[str]:
+    """ Collect the configuration files given directly or via a directory """
+    result = []
+    if config_files is not None:
+        result.extend(config_files)
+    if config_dir is not None:
+        for filename in sorted(os.listdir(config_dir)):
+            if filename.endswith(".yml") or filename.endswith(".yaml"):
+                result.append(os.path.join(config_dir, filename))
+    return result
+
+
+class SphTenant:
+    """ A single SPH account checked by the multi-tenant executor """
+
+    def __init__(self, name: str, executor: SphExecutor) -> None:
+        self.name = name
+        self.executor = executor
+
+    def check(self) -> bool:
+        """ Check the SPH for this tenant, errors do not leave the tenant """
+        thread = threading.current_thread()
+        thread_name = thread.name
+        thread.name = self.name
+        try:
+            return self.executor.check()
+        except Exception as exc:
+            traceback.print_exc()
+            self.executor.push_service.send_error(str(exc))
+            return False
+        finally:
+            thread.name = thread_name
+
+
+class SphMultiTenantExecutor:
+    """ Executing the checks in the SPH for many accounts """
+
+    def __init__(self, configs: list[SphConfig], workers: int) -> None:
+        if len(configs) == 0:
+            raise SphException("No configuration given")
+        if workers < 1:
+            raise SphException(f"Invalid number of workers: {workers}")
+
+        self.tenants: list[SphTenant] = []
+        # One school directory for all tenants, it is only loaded if a tenant needs it
+        school_directory = SphSchoolDirectory(configs[0]["school-directory"],
+                                              configs[0].get_storage_directory())
+        hash_files = {}
+        storage_dirs = {}
+        for config in configs:
+            name = config.get_name()
+            storage_dir = os.path.abspath(config.get_storage_directory())
+            if storage_dir in storage_dirs:
+                raise SphException(
+                    f"Tenants {storage_dirs[storage_dir]} and {name} share the storage directory {storage_dir}")
+            storage_dirs[storage_dir] = name
+            hash_file = self.__get_hash_file(config)
+            if hash_file is not None:
+                if hash_file in hash_files:
+                    raise SphException(
+                        f"Tenants {hash_files[hash_file]} and {name} share the hash file {hash_file}")
+                hash_files[hash_file] = name
+
+            try:
+                self.tenants.append(SphTenant(name, SphExecutor(config, school_directory)))
+                logging.info("Tenant %s added", name)
+            except Exception as exc:
+                traceback.print_exc()
+                logging.error("Tenant %s skipped: %s", name, str(exc))
+
+        if len(self.tenants) == 0:
+            raise SphException("No tenant could be initialized")
+
+        for config in configs[1:]:
+            if config["execution"] != configs[0]["execution"]:
+                logging.warning("Execution configuration of %s is ignored, using the one of %s",
+                                config.filename, configs[0].filename)
+        self.execution = Execution(configs[0]["execution"], None,
+                                   configs[0].get_storage_directory(),
+                                   self.is_check_day)
+        self.workers = min(workers, len(self.tenants))
+        self.pool = ThreadPoolExecutor(max_workers=self.workers,
+                                       thread_name_prefix="tenant")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_) -> None:
+        logging.info("Exiting SPH multi-tenant executor ...")
+        wait([self.pool.submit(t.executor.close) for t in self.tenants])
+        self.pool.shutdown()
+
+    def run(self) -> None:
+        """ Run the SPH checks of all tenants scheduled or once """
+        self.execution.run_scheduled(self.check)
+
+    def check(self) -> bool:
+        """ Check the SPH for all tenants using the worker pool, True if a page changed """
+        logging.info("Checking SPH for %d tenants with %d workers ...",
+                     len(self.tenants), self.workers)
+        futures = [self.pool.submit(t.check) for t in self.tenants]
+        wait(futures)
+        logging.info("Checking SPH for %d tenants ... done", len(self.tenants))
+        return any(future.result() for future in futures)
+
+    def is_check_day(self, day: date) -> bool:
+        """ True if any tenant has to be checked on that day """
+        return any(t.executor.holiday.is_check_day(day) for t in self.tenants)
+
+    def __get_hash_file(self, config: SphConfig):
+        push_config = config["push-over"]
+        if push_config is None or 'hash-file' not in push_config:
+            return None
+        filename = push_config['hash-file']
+        if not filename.startswith("/"):
+            filename = config.get_storage_filename(filename)
+        return os.path.splitext(os.path.abspath(filename))[0] + ".db"
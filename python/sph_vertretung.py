@@ -7,23 +7,15 @@ import argparse
 import logging
 import signal
 import sys
-import traceback
 from datetime import datetime
 from typing import Any
 
 import pytz
 
-from delegation_table import DelegationTable
-from execution.execution import Execution
-from information_table import InformationTable
-from push_over.push_over import PushOver
-from school_holidays.school_holidays import SchoolHolidays
+from metrics.metrics_server import MetricsServer
 from sph.sph_config import SphConfig
-from sph.sph_exception import SphException, SphLoggedOutException
-from sph.sph_html import SphHtml
-from sph.sph_school import SphSchool
-from sph.sph_session import SphSession
-from sph.sph_session import SphSessionException
+from sph_executor import SphExecutor
+from sph_multi_tenant import SphMultiTenantExecutor, get_config_files
 
 
 class TimezoneAwareLogFormatter(logging.Formatter):
@@ -59,131 +51,6 @@ rootLogger.addHandler(consoleHandler)
 rootLogger.setLevel(logging.INFO)
 
 
-class SphExecutor:
-    """Executing the checks in the SPH"""
-
-    def __init__(self, config: SphConfig) -> None:
-        self.config = config
-        self.school = SphSchool(
-            city=config["school-city"],
-            name=config["school-name"],
-            school_id=config["school-id"],
-        )
-        self.holiday = SchoolHolidays(config["school-holidays"])
-        self.push_service = PushOver(config["push-over"], self.config.get_storage_directory())
-        self.execution = Execution(config["execution"], self.push_service)
-
-        self.session = SphSession(
-            school_id=self.school.get_id(),
-            user=config["user"],
-            password=config["password"],
-        )
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, *_) -> None:
-        logging.info("Exiting SPH executor ...")
-        self.__logout()
-
-    def run(self) -> None:
-        """Run the SPH checks scheduled or once"""
-        self.execution.run_scheduled(self.__try_check_sph)
-
-    def __try_check_sph(self) -> None:
-        if self.holiday.is_holiday_today():
-            self.__logout()
-            return
-
-        logging.info("Checking SPH ...")
-
-        if not self.__check_sph():
-            logging.info("Checking SPH ... trying once more")
-            self.__check_sph()
-
-        logging.info("Checking SPH ... done")
-
-    def __check_sph(self) -> bool:
-        if self.__login():
-            try:
-                self.__parse_delegation_html(
-                    self.config["class"], self.config["fields"]
-                )
-                return True
-            except SphLoggedOutException as exception:
-                logging.error("Failed to process html: %s", str(exception))
-                self.__logout()
-            except SphException as exception:
-                traceback.print_exc()
-                logging.error("Failed to process html: %s", str(exception))
-                self.__logout()
-
-        return False
-
-    def __login(self) -> bool:
-        try:
-            self.session.login()
-            return True
-        except SphSessionException as exception:
-            logging.error("Failed to login: %s", str(exception))
-            return False
-
-    def __logout(self) -> None:
-        try:
-            self.session.logout()
-        except SphSessionException as exception:
-            logging.error("Failed to logout: %s", str(exception))
-
-    def __parse_delegation_html(self, clazz: str, fields: list[str]):
-        sph_html = self.__get_delegation_html()
-        now = datetime.now()
-        for div in sph_html.get_matching_divs("id", "tag"):
-            date = datetime.strptime(
-                div.get("id").replace("tag", ""), "%d_%m_%Y"
-            ).date()
-            date_str = date.strftime("%d.%m.%Y")
-
-            if date < now.date():
-                logging.info("Skipping %s ...", date.strftime("%d.%m.%Y"))
-                continue
-
-            # Process info table
-            info_element = div.find_next("table", {"class": "infos"})
-            info_table = InformationTable(clazz, fields, date_str, info_element)
-            for info_event in info_table.search_by_class_and_fields():
-                self.push_service.send(info_event, self.__push_info_message(info_event))
-
-            # Process delegation table
-            table_element = div.find_next(
-                "table", {"id": div.get("id").replace("tag", "vtable")}
-            )
-            table = DelegationTable(clazz, fields, date_str, table_element)
-            for event in table.search_by_class():
-                self.push_service.send(event, self.__push_message(event))
-
-    def __get_delegation_html(self) -> SphHtml:
-        try:
-            delegation_txt = self.session.get("vertretungsplan.php")
-            sph_html = SphHtml(delegation_txt)
-            sph_html.write_html_file(self.config.get_storage_filename("vertretungsplan.html"))
-            if sph_html.is_logged_out():
-                raise SphLoggedOutException("Not logged in any longer!")
-            return sph_html
-        except SphSessionException as exception:
-            raise SphException("Failed to get delegation html") from exception
-
-    def __push_info_message(self, event: dict[str, str]) -> str:
-        return (
-            f"{event['Datum']}: {event['Info']}"
-        )
-
-    def __push_message(self, event: dict[str, str]) -> str:
-        return (
-            f"{event['Datum']}: {event['Hinweis']} im Fach {event['Fach']} "
-            f"in Stunde {event['Stunde']}"
-        )
-
-
 def parse_arguments() -> Any:
     """Parse command line arguments and return to the caller"""
     parser = argparse.ArgumentParser(
@@ -192,13 +59,28 @@ def parse_arguments() -> Any:
     parser.add_argument(
         "-c",
         "--config-file",
-        help="Yaml config file",
+        help="Yaml config file, may be given multiple times",
+        action="append",
+        type=str,
+    )
+    parser.add_argument(
+        "--config-dir",
+        help="Directory with one yaml config file per account",
         action="store",
         type=str,
-        required=True,
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of accounts checked in parallel",
+        action="store",
+        type=int,
+        default=8,
     )
     parser.add_argument("-d", "--debug", action=argparse.BooleanOptionalAction)
     args = parser.parse_args()
+    if args.config_file is None and args.config_dir is None:
+        parser.error("one of the arguments -c/--config-file --config-dir is required")
     return args
 
 
@@ -220,12 +102,24 @@ def main():
 
     logging.info("Arguments: %s", str(args))
 
-    config = SphConfig(args.config_file, False)
+    config_files = get_config_files(args.config_file, args.config_dir)
 
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
-    with SphExecutor(config) as executor:
+    if len(config_files) == 1:
+        config = SphConfig(config_files[0], False)
+        with MetricsServer(config["metrics"]), SphExecutor(config) as executor:
+            executor.run()
+        return
+
+    consoleHandler.setFormatter(TimezoneAwareLogFormatter(
+        fmt="%(asctime)s [%(threadName)-12.12s] [%(funcName)-12.12s] [%(levelname)-4.7s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S %Z",
+    ))
+    configs = [SphConfig(config_file, False) for config_file in config_files]
+    with MetricsServer(configs[0]["metrics"]), \
+            SphMultiTenantExecutor(configs, args.workers) as executor:
         executor.run()
 
 
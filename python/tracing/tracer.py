@@ -0,0 +1,219 @@
+""" Tree of timed spans per check written as JSON lines """
+
+import cProfile
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+from sph.sph_exception import SphException
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# Spans of the trace running in the current thread
+_local = threading.local()
+# Only one profiler can be active in the process
+_profile_lock = threading.Lock()
+
+
+class Span:
+    """ Timed part of a check with attributes and nested spans """
+    __slots__ = ("name", "attributes", "children", "start", "end")
+
+    def __init__(self, name: str, attributes: dict[str, Any]) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.children: list[Span] = []
+        self.start = 0.0
+        self.end = 0.0
+
+    def set(self, key: str, value: Any) -> None:
+        """ Add an attribute to the span """
+        self.attributes[key] = value
+
+    def __enter__(self):
+        stack = _local.stack
+        stack[-1].children.append(self)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        _local.stack.pop()
+
+    def to_dict(self, origin: float) -> dict[str, Any]:
+        """ Span and its children with times in ms relative to the origin """
+        result = {'name': self.name,
+                  'start-ms': round((self.start - origin) * 1000, 3),
+                  'duration-ms': round((self.end - self.start) * 1000, 3)}
+        if len(self.attributes) > 0:
+            result['attributes'] = self.attributes
+        if len(self.children) > 0:
+            result['children'] = [child.to_dict(origin) for child in self.children]
+        return result
+
+
+class NullSpan:
+    """ Span doing nothing if no trace is running """
+
+    def set(self, key: str, value: Any) -> None:
+        """ Ignore the attribute """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_) -> None:
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name: str, **attributes: Any):
+    """ Span within the trace of the current thread, a no-op without a trace """
+    if getattr(_local, "stack", None) is None:
+        return NULL_SPAN
+    return Span(name, attributes)
+
+
+class Trace(Span):
+    """ Root span of a check writing the tree of spans when finished """
+    __slots__ = ("tracer", "profiler")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict[str, Any]) -> None:
+        super().__init__(name, attributes)
+        self.tracer = tracer
+        self.profiler = None
+
+    def __enter__(self):
+        _local.stack = [self]
+        self.profiler = self.tracer.start_profiler()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        self.end = time.perf_counter()
+        _local.stack = None
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.tracer.finish(self)
+
+
+class Tracer:
+    """ Record a tree of timed spans per check and profile slow checks """
+    PROFILERS = ["cprofile", "pyinstrument"]
+
+    def __init__(self, tracing_config: dict[str, Any], storage_dir: str) -> None:
+        self.enabled = False
+        self.filename = storage_dir + "/traces.jsonl"
+        self.max_bytes = 10 * 1024 * 1024
+        self.backups = 3
+        self.profile = False
+        self.profile_threshold = 30
+        self.profiler = "cprofile"
+        self.profile_directory = storage_dir + "/profiles"
+        self.handler = None
+
+        if tracing_config is not None:
+            if 'enabled' in tracing_config:
+                self.enabled = tracing_config['enabled']
+            if 'file' in tracing_config:
+                if tracing_config['file'].startswith("/"):
+                    self.filename = tracing_config['file']
+                else:
+                    self.filename = storage_dir + "/" + tracing_config['file']
+            if 'max-bytes' in tracing_config:
+                self.max_bytes = tracing_config['max-bytes']
+            if 'backups' in tracing_config:
+                self.backups = tracing_config['backups']
+            profile_config = tracing_config.get('profile')
+            if profile_config is not None:
+                self.profile = profile_config.get('enabled', False)
+                self.profile_threshold = profile_config.get('threshold', self.profile_threshold)
+                self.profiler = profile_config.get('profiler', self.profiler)
+            if not isinstance(self.max_bytes, int) or self.max_bytes < 0 \
+                    or not isinstance(self.backups, int) or self.backups < 0 \
+                    or not isinstance(self.profile_threshold, (int, float)) \
+                    or self.profiler not in self.PROFILERS:
+                raise SphException(f"Invalid tracing configuration: {str(tracing_config)}")
+
+        if self.profiler == "pyinstrument" and pyinstrument is None:
+            logging.warning("Module pyinstrument is not installed, using cProfile")
+            self.profiler = "cprofile"
+
+        if self.enabled:
+            self.handler = logging.handlers.RotatingFileHandler(
+                self.filename, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+            self.handler.setFormatter(logging.Formatter("%(message)s"))
+            if self.profile:
+                os.makedirs(self.profile_directory, exist_ok=True)
+
+    def trace(self, name: str, **attributes: Any):
+        """ Root span of a check, a no-op if tracing is disabled """
+        if not self.enabled:
+            return NULL_SPAN
+        return Trace(self, name, attributes)
+
+    def start_profiler(self) -> Optional[Any]:
+        """ Profile the trace if enabled and no other trace is profiled """
+        if not self.profile or not _profile_lock.acquire(blocking=False):
+            return None
+        try:
+            if self.profiler == "pyinstrument":
+                profiler = pyinstrument.Profiler(async_mode="disabled")
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+            return profiler
+        except (RuntimeError, ValueError) as exception:
+            logging.debug("Profiling not possible: %s", str(exception))
+            _profile_lock.release()
+            return None
+
+    def finish(self, trace: Trace) -> None:
+        """ Write the trace and keep the profile of a slow check """
+        duration = trace.end - trace.start
+        if trace.profiler is not None:
+            try:
+                self.__stop_profiler(trace.profiler, duration)
+            finally:
+                _profile_lock.release()
+
+        line = json.dumps({'timestamp': datetime.now().isoformat(timespec="milliseconds"),
+                           **trace.to_dict(trace.start)}, ensure_ascii=False, default=str)
+        self.handler.emit(logging.makeLogRecord({'msg': line, 'args': None}))
+
+    def close(self) -> None:
+        """ Close the trace file """
+        if self.handler is not None:
+            self.handler.close()
+            self.handler = None
+
+    def __stop_profiler(self, profiler: Any, duration: float) -> None:
+        if self.profiler == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+        if duration < self.profile_threshold:
+            return
+
+        filename = self.profile_directory + "/" + datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        if self.profiler == "pyinstrument":
+            filename += ".html"
+            with open(filename, "w", encoding="utf-8") as file:
+                file.write(profiler.output_html())
+        else:
+            filename += ".prof"
+            profiler.dump_stats(filename)
+        logging.info("Check took %.1f s, profile written to %s", duration, filename)
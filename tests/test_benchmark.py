@@ -0,0 +1,21 @@
+""" Tests of the generated pages used by the benchmarks and the mock portal """
+
+from benchmark.page_generator import generate_page
+from delegation_table import DelegationTable
+from sph.sph_html import SphHtml
+
+
+def test_generated_page_is_reproducible():
+    assert generate_page(days=2, rows=5, seed=7) == generate_page(days=2, rows=5, seed=7)
+    assert generate_page(days=2, rows=5, seed=7) != generate_page(days=2, rows=5, seed=8)
+
+
+def test_generated_page_has_days_and_tables():
+    sph_html = SphHtml(generate_page(days=3, rows=10, seed=1, menu_entries=5, alerts=1))
+    days = sph_html.get_day_divs()
+    assert len(days) == 3
+    for div in days:
+        assert sph_html.get_info_table(div) is not None
+        table = DelegationTable(div.get("id"), sph_html.get_delegation_table(div))
+        assert len(table.table.find_all("tr")) > 10
+    assert not sph_html.is_logged_out()
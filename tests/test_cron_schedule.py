@@ -0,0 +1,47 @@
+""" Tests of the cron specification """
+
+from datetime import datetime
+
+import pytest
+
+from execution.cron_schedule import CronSchedule, parse_field
+
+
+def test_next_after_same_day():
+    schedule = CronSchedule("*/15 6-8 * * mon-fri")
+    assert schedule.next_after(datetime(2024, 1, 2, 6, 14, 30)) == datetime(2024, 1, 2, 6, 15)
+    assert schedule.next_after(datetime(2024, 1, 2, 8, 45)) == datetime(2024, 1, 3, 6, 0)
+
+
+def test_next_after_skips_weekend():
+    schedule = CronSchedule("0 7 * * 1-5")
+    assert schedule.next_after(datetime(2024, 1, 5, 7, 0)) == datetime(2024, 1, 8, 7, 0)
+
+
+def test_day_of_month_or_day_of_week_if_both_restricted():
+    schedule = CronSchedule("0 7 1 * mon-fri")
+    assert schedule.next_after(datetime(2024, 1, 1, 7, 22)) == datetime(2024, 1, 2, 7, 0)
+    # Saturday the 1st fires because of the day of month
+    assert schedule.next_after(datetime(2024, 5, 31, 8, 0)) == datetime(2024, 6, 1, 7, 0)
+
+
+def test_day_of_month_and_day_of_week_if_one_is_unrestricted():
+    assert CronSchedule("0 7 13 * *").next_after(datetime(2024, 1, 1)) == datetime(2024, 1, 13, 7, 0)
+    assert CronSchedule("0 7 */10 * 5").next_after(datetime(2024, 1, 1)) == datetime(2024, 3, 1, 7, 0)
+
+
+def test_sunday_is_zero_or_seven():
+    assert CronSchedule("0 9 * * 0").next_after(datetime(2024, 1, 1)) == datetime(2024, 1, 7, 9, 0)
+    assert CronSchedule("0 9 * * 7").next_after(datetime(2024, 1, 1)) == datetime(2024, 1, 7, 9, 0)
+
+
+def test_parse_field():
+    assert parse_field("0,30", 0, 59) == {0, 30}
+    assert parse_field("50/5", 0, 59) == {50, 55}
+    assert parse_field("jan-mar", 1, 12, ["jan", "feb", "mar"], 1) == {1, 2, 3}
+
+
+@pytest.mark.parametrize("spec", ["* * * *", "61 * * * *", "* * * * 8", "*/0 * * * *", "5-1 * * * *"])
+def test_invalid_spec(spec):
+    with pytest.raises(ValueError):
+        CronSchedule(spec)
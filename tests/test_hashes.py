@@ -0,0 +1,38 @@
+""" Tests of the store of known events """
+
+from push_over.hashes import Hashes, get_event_date
+
+
+def test_event_date():
+    assert get_event_date("24.12.2099") == "2099-12-24"
+    assert get_event_date("invalid") is None
+    assert get_event_date(None) is None
+
+
+def test_known_hashes_survive_a_restart(tmp_path):
+    hashes = Hashes("hashes.txt", str(tmp_path))
+    hashes.add("future", "{'Datum': '01.01.2099'}", "01.01.2099")
+    hashes.add("undated", "{}")
+    hashes.commit()
+
+    hashes = Hashes("hashes.txt", str(tmp_path))
+    assert hashes.already_known("future")
+    assert hashes.already_known("undated")
+    assert not hashes.already_known("unknown")
+
+
+def test_hashes_of_past_events_are_removed(tmp_path):
+    hashes = Hashes("hashes.txt", str(tmp_path))
+    hashes.add("past", "{'Datum': '01.01.2000'}", "01.01.2000")
+    assert hashes.already_known("past")
+    hashes.commit()
+    assert not hashes.already_known("past")
+
+
+def test_legacy_hash_file_is_migrated(tmp_path):
+    with open(tmp_path / "hashes.txt", "w", encoding="utf-8") as file:
+        file.write("abc - {'Datum': '01.01.2099', 'Info': 'x'}\n")
+        file.write("broken line\n")
+    hashes = Hashes("hashes.txt", str(tmp_path))
+    assert hashes.already_known("abc")
+    assert (tmp_path / "hashes.txt.migrated").exists()
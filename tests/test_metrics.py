@@ -0,0 +1,49 @@
+""" Tests of the metrics in the Prometheus text format """
+
+import time
+
+import pytest
+
+from metrics.metrics import Counter, Gauge, Histogram, Metric, MetricsRegistry
+from metrics.metrics_server import LAST_SUCCESS, get_stalest_tenant, register_tenant
+
+
+def test_metric_needs_samples():
+    with pytest.raises(TypeError):
+        Metric("sph_test", "Test")  # pylint: disable=abstract-class-instantiated
+
+
+def test_labelled_counter():
+    counter = Counter("sph_test_total", "Test", ("result",))
+    counter.labels("ok").inc()
+    counter.labels("ok").inc(2)
+    counter.labels('a"b').inc()
+    assert counter.collect() == ["# HELP sph_test_total Test", "# TYPE sph_test_total counter",
+                                 'sph_test_total{result="ok"} 3', 'sph_test_total{result="a\\"b"} 1']
+
+
+def test_histogram_buckets():
+    histogram = Histogram("sph_test_seconds", "Test", buckets=(1.0, 2.0))
+    histogram.observe(0.5)
+    histogram.observe(1.5)
+    histogram.observe(3)
+    assert histogram.collect()[2:] == ['sph_test_seconds_bucket{le="1"} 1', 'sph_test_seconds_bucket{le="2"} 2',
+                                       'sph_test_seconds_bucket{le="+Inf"} 3',
+                                       'sph_test_seconds_sum 5', 'sph_test_seconds_count 3']
+
+
+def test_gauge_function():
+    gauge = Gauge("sph_test", "Test")
+    gauge.set_function(lambda: 42)
+    assert gauge.collect()[-1] == "sph_test 42"
+    assert isinstance(MetricsRegistry().gauge("sph_test", "Test"), Gauge)
+
+
+def test_health_reports_the_stalest_tenant():
+    register_tenant("healthy")
+    register_tenant("failing")
+    LAST_SUCCESS.labels("healthy").set(time.time())
+    LAST_SUCCESS.labels("failing").set(time.time() - 10000)
+    tenant, age = get_stalest_tenant()
+    assert tenant == "failing"
+    assert age >= 10000
@@ -0,0 +1,80 @@
+""" Tests of the persistent outbox for push messages """
+
+import time
+
+import pytest
+
+from push_over.outbox import Outbox, OutboxWorker
+from sph.sph_exception import SphException
+
+EVENT = ("key", "{'Info': 'x'}", "01.01.2099")
+
+
+@pytest.fixture(name="outbox")
+def fixture_outbox(tmp_path):
+    return Outbox({'enabled': True, 'max-attempts': 3, 'backoff': 10}, str(tmp_path))
+
+
+def test_message_per_user(outbox):
+    outbox.enqueue(["A", "B"], "message", [EVENT])
+    due = outbox.get_due(time.time())
+    assert [(m.user, m.message, m.events) for m in due] == [("A", "message", [EVENT]),
+                                                           ("B", "message", [EVENT])]
+    assert outbox.is_queued("key")
+
+
+def test_event_is_finished_with_the_last_user(outbox):
+    outbox.enqueue(["A", "B"], "message", [EVENT])
+    first, second = outbox.get_due(time.time())
+    assert outbox.remove(first) == []
+    assert outbox.remove(second) == [EVENT]
+    assert not outbox.is_queued("key")
+    assert outbox.size() == 0
+
+
+def test_retry_with_backoff_until_given_up(outbox):
+    outbox.enqueue(["A"], "message", [EVENT])
+    message = outbox.get_due(time.time())[0]
+    assert outbox.retry(message)
+    assert outbox.get_due(time.time()) == []
+    assert len(outbox.get_due(time.time() + 11)) == 1
+
+    message = outbox.get_due(time.time() + 11)[0]
+    assert outbox.retry(message)
+    message = outbox.get_due(time.time() + 3600)[0]
+    assert message.attempts == 2
+    assert not outbox.retry(message)
+
+
+def test_postpone_until_limit_reset(outbox):
+    outbox.enqueue(["A", "B"], "message", [EVENT])
+    reset = time.time() + 600
+    outbox.postpone(reset)
+    assert outbox.get_due(reset - 1) == []
+    assert outbox.get_next_attempt() == pytest.approx(reset)
+
+
+def test_worker_backs_off_after_failed_delivery(outbox):
+    calls = []
+
+    def deliver(messages):
+        calls.append(len(messages))
+        raise OSError("network down")
+
+    worker = OutboxWorker(outbox, deliver)
+    worker.start()
+    outbox.enqueue(["A"], "message", [EVENT])
+    worker.notify()
+    time.sleep(0.5)
+    worker.notify()
+    time.sleep(0.2)
+    worker.stop(5)
+
+    assert calls == [1]
+    assert not worker.is_alive()
+    assert outbox.size() == 1
+
+
+def test_invalid_configuration(tmp_path):
+    with pytest.raises(SphException):
+        Outbox({'enabled': True, 'max-attempts': 0}, str(tmp_path))
@@ -0,0 +1,80 @@
+""" Tests of delivering push messages from the outbox """
+
+import time
+
+import pytest
+
+from push_over.push_over import PushOver, split_messages
+from push_over.push_over_client import PushOverResult
+
+
+class FakeClient:
+    """ Answers each request with the status configured for the user """
+
+    def __init__(self, statuses: dict[str, int], headers: dict[str, str] = None) -> None:
+        self.statuses = statuses
+        self.headers = headers or {}
+        self.sent: list[tuple[list[str], str]] = []
+
+    def send_to_users(self, push_users, message):
+        users = [push_user['user'] for push_user in push_users]
+        self.sent.append((users, message))
+        return [PushOverResult([user], self.statuses.get(user, 200), 0.01,
+                               self.headers if self.statuses.get(user, 200) == 429 else {})
+                for user in users]
+
+
+@pytest.fixture(name="push_over")
+def fixture_push_over(tmp_path):
+    push_config = {
+        'enabled': True,
+        'hash-file': 'hashes.db',
+        'batching': {'enabled': True},
+        'outbox': {'enabled': True},
+        'users': [{'user': name, 'user-key': f"key-{name}", 'api-token': "token",
+                   'send-errors': False} for name in ("A", "B", "C")],
+    }
+    push_over = PushOver(push_config, str(tmp_path))
+    # Deliver explicitly instead of in the background
+    push_over.close(5)
+    return push_over
+
+
+def queue(push_over: PushOver, date: str, info: str) -> None:
+    push_over.send({'Datum': date, 'Info': info}, f"{date}: {info}")
+    push_over.flush()
+
+
+def test_rate_limit_finishes_accepted_recipients(push_over):
+    reset = time.time() + 600
+    push_over.client = FakeClient({'A': 429}, {'X-Limit-App-Reset': str(reset)})
+    queue(push_over, "01.01.2099", "first")
+    queue(push_over, "02.01.2099", "second")
+
+    push_over.deliver_outbox()
+
+    # Only the first message was posted, B and C accepted it
+    assert len(push_over.client.sent) == 1
+    assert push_over.outbox.get_due(reset - 1) == []
+    remaining = push_over.outbox.get_due(reset + 1)
+    assert sorted((m.user, m.message) for m in remaining) == [
+        ("A", "01.01.2099: first"),
+        ("A", "02.01.2099: second"), ("B", "02.01.2099: second"), ("C", "02.01.2099: second")]
+
+
+def test_delivered_message_is_not_sent_again(push_over):
+    push_over.client = FakeClient({})
+    queue(push_over, "01.01.2099", "first")
+
+    push_over.deliver_outbox()
+    push_over.deliver_outbox()
+    queue(push_over, "01.01.2099", "first")
+    push_over.deliver_outbox()
+
+    assert push_over.client.sent == [(["A", "B", "C"], "01.01.2099: first")]
+    assert push_over.outbox.size() == 0
+
+
+def test_split_messages_joins_lines_up_to_the_limit():
+    assert split_messages(["aaa", "bbb", "ccc"], 7) == ["aaa\nbbb", "ccc"]
+    assert split_messages(["aaaaaaaaaa"], 4) == ["aaaa", "aaaa", "aa"]
@@ -0,0 +1,30 @@
+""" Tests of the days to check depending on the school holidays """
+
+from datetime import date
+
+from school_holidays.school_holidays import SchoolHolidays
+
+HOLIDAYS = [{2024: [{'name': "Herbstferien", 'from': "2024-10-14", 'to': "2024-10-25"},
+                    {'name': "Tag der Einheit", 'from': "2024-10-03", 'to': "2024-10-03"}]}]
+
+
+def test_every_day_is_checked_without_holidays():
+    holidays = SchoolHolidays(None)
+    assert holidays.is_check_day(date(2024, 10, 5))
+    assert holidays.is_check_day(date(2024, 10, 6))
+
+
+def test_holidays_and_weekends_are_skipped():
+    holidays = SchoolHolidays(HOLIDAYS)
+    assert holidays.is_check_day(date(2024, 10, 2))
+    assert not holidays.is_check_day(date(2024, 10, 3))
+    assert not holidays.is_check_day(date(2024, 10, 5))
+    assert not holidays.is_check_day(date(2024, 10, 15))
+
+
+def test_day_before_school_starts_is_checked():
+    holidays = SchoolHolidays(HOLIDAYS)
+    assert holidays.is_check_day(date(2024, 10, 6))
+    # Sunday before the holidays
+    assert not holidays.is_check_day(date(2024, 10, 13))
+    assert holidays.is_check_day(date(2024, 10, 27))
@@ -0,0 +1,81 @@
+""" Tests of the difference between consecutive delegation tables """
+
+import json
+
+from push_over.push_over import hash_event
+from sph.sph_plan_diff import ADDED, CHANGED, REMOVED, SphPlanDiff
+
+DAY = "01.01.2099"
+
+
+def row(hour: str, room: str, note: str = "Vertretung") -> dict[str, str]:
+    return {'Datum': DAY, 'Klasse': "5a", 'Stunde': hour, 'Fach': "M", 'Raum': room, 'Hinweis': note}
+
+
+def test_changes_since_last_check(tmp_path):
+    plan_diff = SphPlanDiff({'enabled': True}, str(tmp_path))
+    assert [kind for kind, _, _ in plan_diff.update_day(DAY, [(row("1", "101"), ("anna",)),
+                                                              (row("2", "102"), ("anna",))])] \
+        == [ADDED, ADDED]
+    plan_diff.finish()
+
+    plan_diff = SphPlanDiff({'enabled': True}, str(tmp_path))
+    changes = plan_diff.update_day(DAY, [(row("1", "201"), ("anna",)), (row("3", "103"), ("anna",))])
+    assert [(kind, event['Stunde']) for kind, event, _ in changes] \
+        == [(CHANGED, "1"), (ADDED, "3"), (REMOVED, "2")]
+    assert changes[0][1]['Geändert'] == "Raum"
+    assert changes[2][1]['Status'] == "entfernt"
+
+
+def test_changed_fields_are_named(tmp_path):
+    plan_diff = SphPlanDiff({'enabled': True}, str(tmp_path))
+    plan_diff.update_day(DAY, [(row("1", "101"), ("anna",))])
+    plan_diff.finish()
+    changes = plan_diff.update_day(DAY, [(row("1", "101", "Entfall"), ("anna",))])
+    assert [(kind, event['Geändert']) for kind, event, _ in changes] == [(CHANGED, "Hinweis")]
+
+
+def test_repeated_changes_are_distinct_events(tmp_path):
+    rooms = ["101", None, "101", "202", "101", "202"]
+    hashes = set()
+    kinds = []
+    for room in rooms:
+        plan_diff = SphPlanDiff({'enabled': True}, str(tmp_path))
+        events = [] if room is None else [(row("1", room), ("anna",))]
+        changes = plan_diff.update_day(DAY, events)
+        changes.extend(plan_diff.finish())
+        for kind, event, _ in changes:
+            kinds.append(kind)
+            hashes.add(hash_event(event))
+    assert kinds == [ADDED, REMOVED, ADDED, CHANGED, CHANGED, CHANGED]
+    assert len(hashes) == len(kinds)
+
+
+def test_rows_of_a_day_no_longer_on_the_page_are_removed(tmp_path):
+    other_day = "02.01.2099"
+    plan_diff = SphPlanDiff({'enabled': True}, str(tmp_path))
+    plan_diff.update_day(DAY, [(row("1", "101"), ("anna",))])
+    plan_diff.update_day(other_day, [(row("2", "102"), ("ben",))])
+    assert plan_diff.finish() == []
+
+    plan_diff.update_day(other_day, [(row("2", "102"), ("ben",))])
+    changes = plan_diff.finish()
+    assert [(kind, event['Datum'], event['Stunde'], recipients)
+            for kind, event, recipients in changes] == [(REMOVED, DAY, "1", ("anna",))]
+    assert plan_diff.finish() == []
+
+
+def test_page_without_days_removes_nothing(tmp_path):
+    plan_diff = SphPlanDiff({'enabled': True}, str(tmp_path))
+    plan_diff.update_day(DAY, [(row("1", "101"), ("anna",))])
+    plan_diff.finish()
+    assert plan_diff.finish() == []
+    assert plan_diff.update_day(DAY, [(row("1", "101"), ("anna",))]) == []
+
+
+def test_state_without_numbered_changes_is_read(tmp_path):
+    with open(tmp_path / "plan-state.json", "w", encoding="utf-8") as file:
+        json.dump({DAY: {"5a|1|M": [row("1", "101"), ["anna"]]}}, file)
+    plan_diff = SphPlanDiff({'enabled': True}, str(tmp_path))
+    changes = plan_diff.update_day(DAY, [(row("1", "202"), ("anna",))])
+    assert [(kind, event['Änderung']) for kind, event, _ in changes] == [(CHANGED, "1")]
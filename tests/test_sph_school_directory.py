@@ -0,0 +1,48 @@
+""" Tests of searching the cached school directory """
+
+import json
+import time
+
+import pytest
+
+from sph.sph_school_directory import SphSchoolDirectory, normalize
+
+SCHOOLS = [
+    ["4711", "Lessinggymnasium", "Frankfurt am Main"],
+    ["4712", "Goethe-Schule", "Frankfurt am Main"],
+    ["4713", "Goethe-Gymnasium", "Kassel"],
+    ["4714", "Grundschule Süd", "Gießen"],
+    ["4715", "Goetheschule", "Kassel"],
+    ["4716", "Schule am Goetheplatz", "Kassel"],
+]
+
+
+@pytest.fixture(name="directory")
+def fixture_directory(tmp_path):
+    with open(tmp_path / "schools.json", "w", encoding="utf-8") as file:
+        json.dump({'fetched': time.time(), 'schools': SCHOOLS}, file)
+    return SphSchoolDirectory(None, str(tmp_path))
+
+
+def test_normalize():
+    assert normalize("  Grundschule  Süd ") == "grundschule sued"
+    assert normalize("Goethe-Schule") == "goethe schule"
+
+
+def test_search_by_word_prefix(directory):
+    assert directory.search("gymn goethe", "Kassel") == "4713"
+    assert directory.search("grundsch sü", "giessen") == "4714"
+
+
+def test_first_school_containing_the_name_wins(directory):
+    assert directory.search("Goethe", "Kassel") == "4713"
+    assert directory.search("schule", "Kassel") == "4715"
+    assert directory.search("schule am", "Kassel") == "4716"
+
+
+def test_search_by_part_of_a_word(directory):
+    assert directory.search("gymnasium", "Frankfurt") == "4711"
+
+
+def test_search_without_match(directory):
+    assert directory.search("Goethe", "Gießen") is None
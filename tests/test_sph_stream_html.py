@@ -0,0 +1,58 @@
+""" Tests of evaluating pages while they are received """
+
+import pytest
+
+from benchmark.page_generator import generate_page
+from sph.sph_html import SphHtml
+from sph.sph_stream_html import SphStreamHtml
+
+
+def stream(page: str, chunk_size: int) -> tuple[SphStreamHtml, list]:
+    stream_html = SphStreamHtml()
+    days = []
+    for start in range(0, len(page), chunk_size):
+        days.extend((start, day) for day in stream_html.feed(page[start:start + chunk_size]))
+    days.extend((len(page), day) for day in stream_html.close())
+    return stream_html, days
+
+
+@pytest.mark.parametrize("chunk_size", [1, 97, 4096, 10 ** 7])
+def test_same_days_and_tables_as_whole_page(chunk_size):
+    page = generate_page(days=4, rows=20, seed=3, menu_entries=20, info_rows=2, alerts=2)
+    sph_html = SphHtml(page)
+    expected = [(div.get("id"), str(sph_html.get_info_table(div)), str(sph_html.get_delegation_table(div)))
+                for div in sph_html.get_day_divs()]
+
+    stream_html, days = stream(page, chunk_size)
+    assert [(day.div.get("id"), str(day.info_table), str(day.delegation_table))
+            for _, day in days] == expected
+    assert stream_html.is_logged_out() == sph_html.is_logged_out()
+
+
+def test_days_are_returned_before_the_end_and_released():
+    page = generate_page(days=4, rows=20, seed=3, menu_entries=20)
+    stream_html, days = stream(page, 500)
+    assert days[0][0] < len(page) // 2
+    assert stream_html.pending == []
+    assert stream_html.tables_by_id == {}
+
+
+def test_logged_out_page():
+    page = '<html><body><div class="alert alert-danger">Bitte melden Sie sich an</div></body></html>'
+    stream_html, days = stream(page, 10)
+    assert days == []
+    assert stream_html.is_logged_out()
+
+
+@pytest.mark.parametrize("separator", ["\t", "\n", "\r\n  "])
+def test_attributes_after_tab_or_newline(separator):
+    page = (f'<html><body><div{separator}id="tag01_01_2099" class="panel">'
+            f'<table{separator}class="infos"><tr><td>Info</td></tr></table>'
+            f'<table{separator}id="vtable01_01_2099"><tr><th>Klasse</th></tr></table>'
+            '</div></body></html>')
+    for restricted in (False, True):
+        assert len(SphHtml(page, restricted=restricted).get_day_divs()) == 1
+    _, days = stream(page, 16)
+    assert [day.div.get("id") for _, day in days] == ["tag01_01_2099"]
+    assert days[0][1].info_table is not None
+    assert days[0][1].delegation_table is not None
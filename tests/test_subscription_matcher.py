@@ -0,0 +1,48 @@
+""" Tests of matching rows against the subscriptions of all users """
+
+from matching.subscription_matcher import (PatternMatcher, Subscription, SubscriptionMatcher,
+                                           SubstringIndex, get_subscriptions)
+
+
+def test_substring_index_finds_all_keys_of_same_length():
+    index = SubstringIndex(["05a", "05b", "05c", "7"])
+    assert sorted(index.find("05a, 05b")) == ["05a", "05b"]
+
+
+def test_substring_index_reports_each_key_once():
+    index = SubstringIndex(["5a"])
+    assert index.find("5a 5a") == ["5a"]
+
+
+def test_row_for_several_classes_reaches_all_subscribers():
+    matcher = SubscriptionMatcher({
+        'anna': [Subscription("05a", ["M"])],
+        'ben': [Subscription("05b", ["M"])],
+        'carl': [Subscription("05c", ["M"])],
+    })
+    assert matcher.match_row("05a, 05b", "M") == ('anna', 'ben')
+
+
+def test_row_matches_field_prefix_only():
+    matcher = SubscriptionMatcher({'anna': [Subscription("5a", ["D", "E"])]})
+    assert matcher.match_row("5a", "E-Kurs") == ('anna',)
+    assert matcher.match_row("5a", "M") == ()
+
+
+def test_info_matching_ignores_case_and_whitespace_if_configured():
+    matcher = SubscriptionMatcher({'anna': [Subscription("5a", ["M"])]},
+                                  {'ignore-case': True, 'ignore-whitespace': True})
+    assert matcher.match_info("Klasse 5 A m fällt aus") == ('anna',)
+
+
+def test_pattern_matcher_finds_overlapping_patterns():
+    matcher = PatternMatcher(["5aM", "5a", "aM", ""])
+    assert sorted(matcher.find("x5aMy")) == ["", "5a", "5aM", "aM"]
+
+
+def test_users_without_subscriptions_get_class_and_fields():
+    push_config = {'users': [{'user': 'anna'},
+                             {'user': 'ben', 'subscriptions': [{'class': '7', 'fields': ['E']}]}]}
+    subscriptions = get_subscriptions(push_config, "5a", ["M"])
+    assert [(s.clazz, s.fields) for s in subscriptions['anna']] == [("5a", ["M"])]
+    assert [(s.clazz, s.fields) for s in subscriptions['ben']] == [("7", ["E"])]